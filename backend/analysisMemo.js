@@ -0,0 +1,62 @@
+import { getDb } from './db.js';
+
+// Memo of repository analyses, kept on the finished documents in `results`
+// (repoAnalysis.memo). A resubmission is compared with the latest finished
+// analysis of the same repo, and each sub-stage is reused when its inputs
+// are unchanged:
+//   download    - HEAD commit SHA
+//   description - description URL
+//   scoring     - HEAD commit SHA, description text, rubric and media hashes
+// Repository metadata is always fetched, since the HEAD SHA and the
+// creation-date check both depend on it.
+
+let indexed = null;
+
+function ensureMemoIndex(results) {
+  if (!indexed) {
+    indexed = results.createIndex({ 'repoAnalysis.memo.owner_repo': 1, doneAt: -1 })
+      .catch((error) => {
+        indexed = null;
+        throw error;
+      });
+  }
+  return indexed;
+}
+
+export async function findPreviousAnalysis(owner_repo) {
+  try {
+    const results = (await getDb()).collection('results');
+    await ensureMemoIndex(results);
+    const previous = await results.findOne(
+      { 'repoAnalysis.memo.owner_repo': owner_repo, status: 'done', 'repoAnalysis.status': 'success' },
+      { sort: { doneAt: -1 }, projection: { repoAnalysis: 1 } }
+    );
+    return previous ? previous.repoAnalysis : null;
+  } catch (error) {
+    // A memo lookup failure only costs a full re-run
+    console.error(`Analysis memo lookup failed: ${error.message}`);
+    return null;
+  }
+}
+
+function sameInput(a, b) {
+  return (a ?? null) === (b ?? null);
+}
+
+export function reusableStages(previous, inputs) {
+  const memo = previous && previous.memo;
+  if (!memo || !inputs.headSha || !sameInput(memo.headSha, inputs.headSha)) {
+    return { download: false, description: false, scoring: false };
+  }
+  const details = previous.details || {};
+  const description = sameInput(memo.descriptionUrl, inputs.descriptionUrl) && details.description != null;
+  const scored = details.neuralNetwork && !details.neuralNetwork.error;
+  return {
+    download: Boolean(details.repoInfo),
+    description,
+    // Scoring also depends on the description text, checked once it is known
+    scoring: Boolean(scored) &&
+      sameInput(memo.rubricSha256, inputs.rubricSha256) &&
+      sameInput(memo.mediaSha256, inputs.mediaSha256)
+  };
+}
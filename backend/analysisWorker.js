@@ -0,0 +1,74 @@
+import readline from 'readline';
+import { getRepoCreationDate } from './repo.js';
+import { closeDb, pingDb } from './db.js';
+
+// Long-lived analysis process driven by frontend/server.py. Requests and
+// responses are newline-delimited JSON-RPC 2.0 messages on stdin/stdout, so
+// stdout must carry nothing else: module logging is routed to stderr.
+console.log = (...args) => console.error(...args);
+
+function send(message) {
+  process.stdout.write(JSON.stringify({ jsonrpc: '2.0', ...message }) + '\n');
+}
+
+// Progress is reported as a `progress` notification carrying the request id
+function progressFor(requestId) {
+  return (stage) => send({ method: 'progress', params: { id: requestId, stage } });
+}
+
+const methods = {
+  ping: async () => 'pong',
+  health: async () => {
+    const mongo = await pingDb();
+    return { ok: mongo.ok, pid: process.pid, mongo };
+  },
+  getRepoCreationDate: ({ owner, repo, descURL, eventStartDate, audioPath, rubricPath, videoPath,
+    rubricSha256, mediaSha256, submissionId, workspacePath }, requestId) =>
+    getRepoCreationDate(owner, repo, descURL, eventStartDate, {
+      audioPath,
+      rubricPath,
+      videoPath,
+      rubricSha256,
+      mediaSha256,
+      submissionId,
+      workspacePath,
+      onProgress: progressFor(requestId)
+    }),
+};
+
+async function handle(line) {
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (error) {
+    send({ id: null, error: { code: -32700, message: 'Parse error' } });
+    return;
+  }
+
+  const method = methods[request.method];
+  if (!method) {
+    send({ id: request.id, error: { code: -32601, message: `Method not found: ${request.method}` } });
+    return;
+  }
+
+  try {
+    const result = await method(request.params || {}, request.id);
+    send({ id: request.id, result });
+  } catch (error) {
+    send({ id: request.id, error: { code: -32000, message: error.message } });
+  }
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+
+// Requests are handled concurrently; responses are matched by id
+rl.on('line', (line) => {
+  if (line.trim()) {
+    handle(line);
+  }
+});
+
+rl.on('close', async () => {
+  await closeDb();
+  process.exit(0);
+});
@@ -0,0 +1,49 @@
+import { MongoClient } from 'mongodb';
+import dotenv from 'dotenv';
+
+dotenv.config({ path: '../.env' });
+
+// One client per process, shared by every module. The analysis worker keeps
+// this connection open across requests instead of reconnecting per call.
+const MONGO_TIMEOUT_MS = parseInt(process.env.MONGO_TIMEOUT_MS || '5000', 10);
+
+let client = null;
+let connecting = null;
+
+export function getDb() {
+  if (!connecting) {
+    client = new MongoClient(process.env.MONGODB, {
+      maxPoolSize: parseInt(process.env.MONGO_MAX_POOL_SIZE || '20', 10),
+      minPoolSize: parseInt(process.env.MONGO_MIN_POOL_SIZE || '0', 10),
+      maxIdleTimeMS: parseInt(process.env.MONGO_MAX_IDLE_MS || '300000', 10),
+      serverSelectionTimeoutMS: MONGO_TIMEOUT_MS,
+      connectTimeoutMS: MONGO_TIMEOUT_MS
+    });
+    connecting = client.connect()
+      .then(() => client.db('github_repos'))
+      .catch((error) => {
+        connecting = null;
+        throw error;
+      });
+  }
+  return connecting;
+}
+
+export async function pingDb() {
+  const started = Date.now();
+  try {
+    await (await getDb()).command({ ping: 1 });
+    return { ok: true, latency_ms: Date.now() - started };
+  } catch (error) {
+    return { ok: false, error: error.message };
+  }
+}
+
+export async function closeDb() {
+  if (client) {
+    const closing = client.close();
+    client = null;
+    connecting = null;
+    await closing;
+  }
+}
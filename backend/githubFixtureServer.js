@@ -0,0 +1,181 @@
+import http from 'http';
+import fs from 'fs';
+import path from 'path';
+import crypto from 'crypto';
+import zlib from 'zlib';
+
+// Local stand-in for the parts of GitHub that repo ingestion uses, serving a
+// directory on disk as owner/repo:
+//   node githubFixtureServer.js <dir> [port]
+//   GITHUB_API_URL=http://127.0.0.1:8767 GITHUB_RAW_URL=http://127.0.0.1:8767/raw
+// Tarballs redirect to /codeload like GitHub's and are built in memory.
+// GET /__stats returns request counts; FIXTURE_LATENCY_MS delays every reply.
+
+const BRANCH = 'main';
+const CREATED_AT = '2030-01-01T00:00:00Z';
+
+function gitBlobSha(content) {
+  return crypto.createHash('sha1').update(`blob ${content.length}\0`).update(content).digest('hex');
+}
+
+function listFiles(root, dir = '') {
+  const files = [];
+  for (const entry of fs.readdirSync(path.join(root, dir), { withFileTypes: true })) {
+    const relative = dir ? `${dir}/${entry.name}` : entry.name;
+    if (entry.isDirectory()) {
+      files.push(...listFiles(root, relative));
+    } else if (entry.isFile()) {
+      files.push(relative);
+    }
+  }
+  return files;
+}
+
+function buildTree(root) {
+  return listFiles(root).map((filePath) => {
+    const content = fs.readFileSync(path.join(root, filePath));
+    return { path: filePath, mode: '100644', type: 'blob', sha: gitBlobSha(content), size: content.length };
+  });
+}
+
+function tarHeader(name, size, typeflag) {
+  const header = Buffer.alloc(512);
+  header.write(name, 0, 100, 'utf8');
+  header.write('0000644\0', 100);
+  header.write('0000000\0', 108);
+  header.write('0000000\0', 116);
+  header.write(size.toString(8).padStart(11, '0') + '\0', 124);
+  header.write('00000000000\0', 136);
+  header.write('        ', 148);
+  header.write(typeflag, 156);
+  header.write('ustar\0' + '00', 257);
+  let checksum = 0;
+  for (const byte of header) {
+    checksum += byte;
+  }
+  header.write(checksum.toString(8).padStart(6, '0') + '\0 ', 148);
+  return header;
+}
+
+function paxRecord(key, value) {
+  const body = ` ${key}=${value}\n`;
+  let length = Buffer.byteLength(body);
+  length += String(length + String(length).length).length;
+  return `${length}${body}`;
+}
+
+function tarEntry(name, content, typeflag = '0') {
+  const padding = Buffer.alloc((512 - (content.length % 512)) % 512);
+  return [tarHeader(name, content.length, typeflag), content, padding];
+}
+
+function treeCommit(root) {
+  return crypto.createHash('sha1').update(JSON.stringify(buildTree(root))).digest('hex');
+}
+
+function buildTarball(root, prefix, commit) {
+  const parts = [...tarEntry('pax_global_header', Buffer.from(paxRecord('comment', commit)), 'g')];
+  for (const filePath of listFiles(root)) {
+    const name = `${prefix}/${filePath}`;
+    if (Buffer.byteLength(name) > 100) {
+      parts.push(...tarEntry('PaxHeader', Buffer.from(paxRecord('path', name)), 'x'));
+    }
+    parts.push(...tarEntry(name.slice(0, 100), fs.readFileSync(path.join(root, filePath))));
+  }
+  parts.push(Buffer.alloc(1024));
+  return zlib.gzipSync(Buffer.concat(parts));
+}
+
+export function startFixtureServer(root, port = 8767, latencyMs = 0) {
+  const stats = { requests: 0, byRoute: {} };
+  const count = (route) => {
+    stats.requests++;
+    stats.byRoute[route] = (stats.byRoute[route] || 0) + 1;
+  };
+
+  const server = http.createServer((req, res) => {
+    const url = new URL(req.url, 'http://localhost');
+    const parts = url.pathname.split('/').filter(Boolean).map(decodeURIComponent);
+
+    const reply = (status, body, type = 'application/json') => {
+      setTimeout(() => {
+        res.writeHead(status, { 'Content-Type': type });
+        res.end(type === 'application/json' ? JSON.stringify(body) : body);
+      }, latencyMs);
+    };
+
+    if (url.pathname === '/__stats') {
+      res.writeHead(200, { 'Content-Type': 'application/json' });
+      res.end(JSON.stringify(stats));
+      return;
+    }
+
+    // /repos/:owner/:repo and /repos/:owner/:repo/git/trees/:branch
+    if (parts[0] === 'repos' && parts.length === 3) {
+      count('repo');
+      const [, owner, repo] = parts;
+      return reply(200, {
+        name: repo,
+        full_name: `${owner}/${repo}`,
+        default_branch: BRANCH,
+        created_at: CREATED_AT
+      });
+    }
+    if (parts[0] === 'repos' && parts[3] === 'git' && parts[4] === 'trees') {
+      count('tree');
+      // Re-read per request so edits to the fixture show up as changed SHAs
+      return reply(200, { sha: BRANCH, tree: buildTree(root), truncated: false });
+    }
+
+    // /repos/:owner/:repo/commits/:ref; the commit is a hash of the tree, so
+    // it changes whenever the fixture directory does
+    if (parts[0] === 'repos' && parts[3] === 'commits') {
+      count('commit');
+      const commit = treeCommit(root);
+      if ((req.headers.accept || '').includes('application/vnd.github.sha')) {
+        return reply(200, commit, 'text/plain');
+      }
+      return reply(200, { sha: commit });
+    }
+
+    // /repos/:owner/:repo/tarball/:ref redirects to /codeload/:owner/:repo/tar.gz/:ref
+    if (parts[0] === 'repos' && parts[3] === 'tarball') {
+      count('tarball');
+      const [, owner, repo, , ref] = parts;
+      res.writeHead(302, { Location: `/codeload/${owner}/${repo}/tar.gz/${ref || BRANCH}` });
+      res.end();
+      return;
+    }
+    if (parts[0] === 'codeload' && parts[3] === 'tar.gz') {
+      count('codeload');
+      const [, owner, repo] = parts;
+      const commit = treeCommit(root);
+      return reply(200, buildTarball(root, `${owner}-${repo}-${commit.slice(0, 7)}`, commit), 'application/x-gzip');
+    }
+
+    // /raw/:owner/:repo/:branch/:path
+    if (parts[0] === 'raw' && parts.length > 4) {
+      count('raw');
+      const filePath = path.resolve(root, ...parts.slice(4));
+      if (!filePath.startsWith(path.resolve(root)) || !fs.existsSync(filePath)) {
+        return reply(404, 'Not Found', 'text/plain');
+      }
+      return reply(200, fs.readFileSync(filePath), 'text/plain');
+    }
+
+    count('other');
+    reply(404, { message: 'Not Found' });
+  });
+
+  return new Promise((resolve) => {
+    server.listen(port, '127.0.0.1', () => resolve({ server, stats }));
+  });
+}
+
+if (process.argv[1] && path.resolve(process.argv[1]) === path.resolve(new URL(import.meta.url).pathname)) {
+  const root = path.resolve(process.argv[2] || '.');
+  const port = parseInt(process.argv[3] || '8767', 10);
+  startFixtureServer(root, port, parseInt(process.env.FIXTURE_LATENCY_MS || '0', 10)).then(() => {
+    console.log(`Serving ${root} as a GitHub fixture on http://127.0.0.1:${port}`);
+  });
+}
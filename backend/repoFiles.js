@@ -1,52 +1,351 @@
 import fetch from 'node-fetch';
+import http from 'http';
+import https from 'https';
 import path from 'path';
-import { MongoClient } from 'mongodb';
-import dotenv from 'dotenv';
+import crypto from 'crypto';
+import { getDb } from './db.js';
+import { readTarGz } from './tarStream.js';
 
-dotenv.config({ path: '../.env' });
+// Both URLs can point at githubFixtureServer.js for local runs
+export const GITHUB_API_URL = process.env.GITHUB_API_URL || 'https://api.github.com';
+const GITHUB_RAW_URL = process.env.GITHUB_RAW_URL || 'https://raw.githubusercontent.com';
+// 'tarball' downloads one archive per repo; 'files' fetches blobs individually
+const FETCH_MODE = process.env.REPO_FETCH_MODE || 'tarball';
+const FETCH_CONCURRENCY = parseInt(process.env.REPO_FETCH_CONCURRENCY || '8', 10);
+const MAX_FILE_BYTES = parseInt(process.env.REPO_MAX_FILE_BYTES || `${256 * 1024}`, 10);
+const WRITE_BATCH_SIZE = 100;
 
-const client = new MongoClient(process.env.MONGODB);
-const db = client.db('github_repos');
-const collection = db.collection('files');
+const SKIPPED_DIRS = new Set([
+  'node_modules', '.git', '.next', 'dist', 'build', 'out', 'vendor', 'venv', '.venv', '__pycache__', 'coverage'
+]);
+const SKIPPED_EXTENSIONS = new Set([
+  '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.svg', '.psd',
+  '.mp3', '.mp4', '.wav', '.mov', '.avi', '.webm', '.ogg',
+  '.zip', '.tar', '.gz', '.tgz', '.rar', '.7z', '.jar',
+  '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx',
+  '.exe', '.dll', '.so', '.dylib', '.bin', '.o', '.class', '.pyc', '.wasm',
+  '.ttf', '.otf', '.woff', '.woff2', '.eot',
+  '.db', '.sqlite', '.sqlite3', '.pkl', '.pt', '.h5', '.onnx', '.npy', '.npz', '.lock'
+]);
 
-export async function downloadRepoContents(owner, repo) {
+// Reused sockets; the raw host gets many small requests in parallel
+const httpAgent = new http.Agent({ keepAlive: true, maxSockets: FETCH_CONCURRENCY });
+const httpsAgent = new https.Agent({ keepAlive: true, maxSockets: FETCH_CONCURRENCY });
+
+function githubFetch(url, extraHeaders = {}) {
+  const headers = { 'User-Agent': 'judgejam', ...extraHeaders };
+  if (process.env.GITHUB_TOKEN) {
+    headers.Authorization = `Bearer ${process.env.GITHUB_TOKEN}`;
+  }
+  return fetch(url, {
+    headers,
+    agent: (parsed) => (parsed.protocol === 'http:' ? httpAgent : httpsAgent)
+  });
+}
+
+async function fetchJson(url) {
+  const response = await githubFetch(url);
+  if (!response.ok) {
+    throw new Error(`Failed to fetch ${url}: ${response.status} ${response.statusText}`);
+  }
+  return response.json();
+}
+
+// Manifests are kept for the technology scan; their lockfiles are just noise
+const SKIPPED_FILES = new Set(['package-lock.json', 'pnpm-lock.yaml', 'yarn.lock', 'poetry.lock', 'cargo.lock']);
+
+export function shouldIngest(entry) {
+  if (entry.type !== 'blob' || SKIPPED_FILES.has(path.basename(entry.path).toLowerCase())) {
+    return false;
+  }
+  if (entry.size > MAX_FILE_BYTES) {
+    return false;
+  }
+  const parts = entry.path.split('/');
+  if (parts.slice(0, -1).some((dir) => SKIPPED_DIRS.has(dir))) {
+    return false;
+  }
+  return !SKIPPED_EXTENSIONS.has(path.extname(entry.path).toLowerCase());
+}
+
+// Lexical terms for the validator's BM25 index (backend/video/codeIndex.py);
+// tokenize() must stay in step with the Python version
+const MAX_TERMS_PER_FILE = 500;
+const STOPWORDS = new Set([
+  'the', 'and', 'for', 'if', 'else', 'return', 'import', 'from', 'const', 'let', 'var', 'def', 'class',
+  'function', 'this', 'self', 'new', 'true', 'false', 'null', 'none', 'is', 'in', 'of', 'to', 'as', 'with'
+]);
+
+function tokenize(text) {
+  const tokens = [];
+  for (const word of text.match(/[A-Za-z][A-Za-z0-9]*/g) || []) {
+    const parts = word.match(/[A-Z]+(?![a-z])|[A-Z]?[a-z0-9]+/g) || [];
+    for (const part of parts.length > 1 ? parts : [word]) {
+      const token = part.toLowerCase();
+      if (token.length > 1 && !STOPWORDS.has(token)) {
+        tokens.push(token);
+      }
+    }
+    if (parts.length > 1 && !STOPWORDS.has(word.toLowerCase())) {
+      tokens.push(word.toLowerCase());
+    }
+  }
+  return tokens;
+}
+
+function fileTerms(content) {
+  const counts = new Map();
+  const tokens = tokenize(content);
+  for (const token of tokens) {
+    counts.set(token, (counts.get(token) || 0) + 1);
+  }
+  // Mongo field names can't start with '$' or contain '.'; tokens never do
+  const top = [...counts.entries()].sort((a, b) => b[1] - a[1]).slice(0, MAX_TERMS_PER_FILE);
+  return { terms: Object.fromEntries(top), term_count: tokens.length };
+}
+
+// Same id git gives the blob, so archive files compare against tree SHAs
+function gitBlobSha(content) {
+  return crypto.createHash('sha1').update(`blob ${content.length}\0`).update(content).digest('hex');
+}
+
+// Runs worker over items with at most `limit` in flight, preserving order
+async function mapWithConcurrency(items, limit, worker) {
+  const results = new Array(items.length);
+  let next = 0;
+  const runners = Array.from({ length: Math.min(limit, items.length) }, async () => {
+    while (next < items.length) {
+      const index = next++;
+      results[index] = await worker(items[index], index);
+    }
+  });
+  await Promise.all(runners);
+  return results;
+}
+
+// Upserts and the validator's project-scoped reads both key on owner_repo/path
+let indexed = null;
+
+// Concurrent ingests of one repo could upsert the same path twice before the
+// key was unique; keep one document per path so the unique index can build
+async function removeDuplicateFiles(collection) {
+  const duplicates = collection.aggregate([
+    { $group: { _id: { owner_repo: '$owner_repo', path: '$path' }, ids: { $push: '$_id' }, count: { $sum: 1 } } },
+    { $match: { count: { $gt: 1 } } }
+  ], { allowDiskUse: true });
+  let removed = 0;
+  for await (const group of duplicates) {
+    const result = await collection.deleteMany({ _id: { $in: group.ids.slice(1) } });
+    removed += result.deletedCount;
+  }
+  if (removed) {
+    console.log(`Removed ${removed} duplicate file documents`);
+  }
+}
+
+async function createFileIndex(collection) {
+  const key = { owner_repo: 1, path: 1 };
+  // listIndexes fails with NamespaceNotFound before the first insert
+  const indexes = await collection.indexes().catch((error) => {
+    if (error.code === 26) {
+      return [];
+    }
+    throw error;
+  });
+  const existing = indexes.find((index) => JSON.stringify(index.key) === JSON.stringify(key));
+  if (existing?.unique) {
+    return;
+  }
+  await removeDuplicateFiles(collection);
+  if (existing) {
+    await collection.dropIndex(existing.name);
+  }
+  await collection.createIndex(key, { unique: true });
+}
+
+function ensureIndexes(collection) {
+  if (!indexed) {
+    indexed = createFileIndex(collection).catch((error) => {
+      indexed = null;
+      throw error;
+    });
+  }
+  return indexed;
+}
+
+// Buffers upserts and writes them in unordered bulkWrite batches
+function createFileSink(collection, owner, repo) {
+  const owner_repo = `${owner}_${repo}`;
+  let pending = [];
+  let written = 0;
+
+  const flush = async () => {
+    if (pending.length) {
+      const batch = pending;
+      pending = [];
+      await collection.bulkWrite(batch, { ordered: false });
+    }
+  };
+
+  return {
+    get written() {
+      return written;
+    },
+    flush,
+    async add(filePath, sha, size, content) {
+      pending.push({
+        updateOne: {
+          filter: { owner_repo, path: filePath },
+          update: {
+            $set: {
+              owner_repo,
+              owner,
+              repo,
+              path: filePath,
+              filename: path.basename(filePath),
+              sha,
+              size,
+              content,
+              ...fileTerms(content),
+              fetched_at: new Date()
+            }
+          },
+          upsert: true
+        }
+      });
+      written++;
+      if (pending.length >= WRITE_BATCH_SIZE) {
+        await flush();
+      }
+    }
+  };
+}
+
+async function ingestTree(owner, repo, branch, stored, sink) {
+  const tree = await fetchJson(`${GITHUB_API_URL}/repos/${owner}/${repo}/git/trees/${branch}?recursive=1`);
+  if (tree.truncated) {
+    // GitHub caps recursive listings; the archive always has every file
+    console.log(`Tree of ${owner}/${repo} is truncated; fetching the tarball instead`);
+    return { ...(await ingestTarball(owner, repo, branch, stored, sink)), mode: 'tarball' };
+  }
+  const entries = tree.tree.filter(shouldIngest);
+  const changed = entries.filter((entry) => stored.get(entry.path) !== entry.sha);
+
+  await mapWithConcurrency(changed, FETCH_CONCURRENCY, async (entry) => {
+    const fileUrl = `${GITHUB_RAW_URL}/${owner}/${repo}/${branch}/${entry.path}`;
+    const fileRes = await githubFetch(fileUrl);
+    if (!fileRes.ok) {
+      console.error(`Skipping ${entry.path}: ${fileRes.status} ${fileRes.statusText}`);
+      return;
+    }
+    await sink.add(entry.path, entry.sha, entry.size, await fileRes.text());
+  });
+
+  return {
+    paths: entries.map((entry) => entry.path),
+    filtered: tree.tree.filter((entry) => entry.type === 'blob').length - entries.length,
+    truncated: false
+  };
+}
+
+async function ingestTarball(owner, repo, branch, stored, sink) {
+  // One request (plus GitHub's redirect to codeload); the archive is
+  // gunzipped and parsed as it arrives and never written to disk
+  const response = await githubFetch(`${GITHUB_API_URL}/repos/${owner}/${repo}/tarball/${branch}`);
+  if (!response.ok) {
+    throw new Error(`Failed to fetch tarball for ${owner}/${repo}: ${response.status} ${response.statusText}`);
+  }
+
+  // Entries sit under a single "<owner>-<repo>-<sha>/" directory
+  const relative = (entry) => entry.path.slice(entry.path.indexOf('/') + 1);
+  const wanted = (entry) => shouldIngest({ type: 'blob', path: relative(entry), size: entry.size });
+
+  const paths = [];
+  let filtered = 0;
+  let commit = null;
+  for await (const entry of readTarGz(response.body, { wantContent: wanted })) {
+    commit = entry.global.comment || commit;
+    if (entry.type !== 'file') {
+      continue;
+    }
+    if (!entry.content) {
+      filtered++;
+      continue;
+    }
+    const filePath = relative(entry);
+    const sha = gitBlobSha(entry.content);
+    paths.push(filePath);
+    if (stored.get(filePath) !== sha) {
+      await sink.add(filePath, sha, entry.size, entry.content.toString('utf8'));
+    }
+  }
+
+  return { paths, filtered, truncated: false, commit };
+}
+
+// Commit SHA at the tip of `branch`; the sha media type returns just the hash
+export async function fetchHeadSha(owner, repo, branch) {
+  const response = await githubFetch(`${GITHUB_API_URL}/repos/${owner}/${repo}/commits/${branch}`, {
+    Accept: 'application/vnd.github.sha'
+  });
+  if (!response.ok) {
+    throw new Error(`Failed to fetch HEAD of ${owner}/${repo}: ${response.status} ${response.statusText}`);
+  }
+  return (await response.text()).trim();
+}
+
+// repoData is the repos/{owner}/{repo} response when the caller already has it
+export async function downloadRepoContents(owner, repo, { repoData = null, mode = FETCH_MODE } = {}) {
   try {
-    await client.connect();
+    const started = Date.now();
+    const collection = (await getDb()).collection('files');
+    await ensureIndexes(collection);
 
     const owner_repo = `${owner}_${repo}`;
 
     // Get default branch
-    const repoData = await (await fetch(`https://api.github.com/repos/${owner}/${repo}`)).json();
+    if (!repoData) {
+      repoData = await fetchJson(`${GITHUB_API_URL}/repos/${owner}/${repo}`);
+    }
     const branch = repoData.default_branch;
 
-    // Get file tree recursively
-    const treeRes = await fetch(`https://api.github.com/repos/${owner}/${repo}/git/trees/${branch}?recursive=1`);
-    const tree = await treeRes.json();
-
-    for (const file of tree.tree) {
-      if (file.type === 'blob' && !file.path.includes('package.json')) {
-        const fileUrl = `https://raw.githubusercontent.com/${owner}/${repo}/${branch}/${file.path}`;
-        const fileRes = await fetch(fileUrl);
-        const content = await fileRes.text();
-
-        await collection.insertOne({
-          owner_repo,
-          owner,
-          repo,
-          path: file.path,
-          filename: path.basename(file.path),
-          content,
-          fetched_at: new Date()
-        });
-
-        console.log(`Stored: ${file.path}`);
-      }
+    // Files stored before blob SHAs were recorded can't be compared; drop them
+    await collection.deleteMany({ owner_repo, sha: { $exists: false } });
+
+    const stored = new Map();
+    const existing = collection.find({ owner_repo }, { projection: { _id: 0, path: 1, sha: 1 } });
+    for await (const doc of existing) {
+      stored.set(doc.path, doc.sha);
+    }
+
+    const sink = createFileSink(collection, owner, repo);
+    const ingest = mode === 'files' ? ingestTree : ingestTarball;
+    const result = await ingest(owner, repo, branch, stored, sink);
+    await sink.flush();
+
+    // Only a complete listing says which stored files are gone
+    const wanted = new Set(result.paths);
+    const removed = result.truncated ? [] : [...stored.keys()].filter((filePath) => !wanted.has(filePath));
+    if (removed.length) {
+      await collection.deleteMany({ owner_repo, path: { $in: removed } });
     }
 
-    console.log(`All files from "${owner}/${repo}" stored in MongoDB.`);
+    const summary = {
+      owner_repo,
+      branch,
+      mode: result.mode || mode,
+      commit: result.commit || null,
+      files: result.paths.length,
+      fetched: sink.written,
+      unchanged: result.paths.length - sink.written,
+      removed: removed.length,
+      filtered: result.filtered,
+      truncated: result.truncated,
+      seconds: (Date.now() - started) / 1000
+    };
+    console.log(`Ingested "${owner}/${repo}": ${JSON.stringify(summary)}`);
+    return summary;
   } catch (error) {
     console.error(`Error downloading repo: ${error.message}`);
-  } finally {
-    await client.close();
   }
 }
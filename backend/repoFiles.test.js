@@ -0,0 +1,136 @@
+import { after, before, describe, test } from 'node:test';
+import assert from 'node:assert/strict';
+import crypto from 'crypto';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import { startFixtureServer } from './githubFixtureServer.js';
+
+// Ingestion against githubFixtureServer.js and the Mongo in MONGODB (skipped
+// without one). Each mode ingests the same fixture three times: from
+// scratch, after edits, and unchanged.
+//   MONGODB=mongodb://127.0.0.1:27017 npm test
+
+const OWNER = 'judgejam-test';
+const LONG_PATH = `src/${'nested/'.repeat(14)}deep.py`;
+
+function gitBlobSha(content) {
+  return crypto.createHash('sha1').update(`blob ${content.length}\0`).update(content).digest('hex');
+}
+
+function writeFile(root, filePath, content) {
+  fs.mkdirSync(path.dirname(path.join(root, filePath)), { recursive: true });
+  fs.writeFileSync(path.join(root, filePath), content);
+}
+
+const root = fs.mkdtempSync(path.join(os.tmpdir(), 'judgejam-fixture-'));
+const fixture = await startFixtureServer(root, 0);
+const baseUrl = `http://127.0.0.1:${fixture.server.address().port}`;
+// repoFiles.js reads these when it is imported
+process.env.GITHUB_API_URL = baseUrl;
+process.env.GITHUB_RAW_URL = `${baseUrl}/raw`;
+const { downloadRepoContents, shouldIngest } = await import('./repoFiles.js');
+const { getDb, closeDb } = await import('./db.js');
+
+after(async () => {
+  fixture.server.close();
+  fs.rmSync(root, { recursive: true, force: true });
+  await closeDb();
+});
+
+test('shouldIngest keeps source files and drops generated, binary and oversized ones', () => {
+  assert.equal(shouldIngest({ type: 'blob', path: 'src/app.py', size: 10 }), true);
+  assert.equal(shouldIngest({ type: 'blob', path: 'package.json', size: 10 }), true);
+  assert.equal(shouldIngest({ type: 'tree', path: 'src', size: 0 }), false);
+  assert.equal(shouldIngest({ type: 'blob', path: 'package-lock.json', size: 10 }), false);
+  assert.equal(shouldIngest({ type: 'blob', path: 'node_modules/react/index.js', size: 10 }), false);
+  assert.equal(shouldIngest({ type: 'blob', path: 'public/logo.PNG', size: 10 }), false);
+  assert.equal(shouldIngest({ type: 'blob', path: 'data/huge.csv', size: 10 * 1024 * 1024 }), false);
+});
+
+for (const mode of ['tarball', 'files']) {
+  describe(`downloadRepoContents (${mode})`, { skip: !process.env.MONGODB && 'MONGODB is not set' }, () => {
+    const repo = `ingest-${mode}-${process.pid}`;
+    const owner_repo = `${OWNER}_${repo}`;
+    let files;
+
+    const stored = async () => {
+      const docs = await (await getDb()).collection('files')
+        .find({ owner_repo }, { projection: { _id: 0, path: 1, sha: 1, content: 1 } })
+        .toArray();
+      return new Map(docs.map((doc) => [doc.path, doc]));
+    };
+
+    before(async () => {
+      // The fixture server serves `root` for every owner/repo
+      for (const entry of fs.readdirSync(root)) {
+        fs.rmSync(path.join(root, entry), { recursive: true, force: true });
+      }
+      files = {
+        'app.py': 'from flask import Flask\napp = Flask(__name__)\n',
+        'README.md': '# Demo\n',
+        'src/util.js': 'export const add = (a, b) => a + b;\n',
+        [LONG_PATH]: 'print("deep")\n'
+      };
+      for (const [filePath, content] of Object.entries(files)) {
+        writeFile(root, filePath, content);
+      }
+      writeFile(root, 'package-lock.json', '{}');
+      writeFile(root, 'node_modules/left-pad/index.js', 'module.exports = 1;\n');
+      writeFile(root, 'logo.png', Buffer.from([0x89, 0x50, 0x4e, 0x47]));
+      await (await getDb()).collection('files').deleteMany({ owner_repo });
+    });
+
+    after(async () => {
+      await (await getDb()).collection('files').deleteMany({ owner_repo });
+    });
+
+    test('first run fetches every ingestible file', async () => {
+      const summary = await downloadRepoContents(OWNER, repo, { mode });
+      assert.ok(summary, 'ingestion failed');
+      assert.equal(summary.mode, mode);
+      assert.equal(summary.files, 4);
+      assert.equal(summary.fetched, 4);
+      assert.equal(summary.unchanged, 0);
+      assert.equal(summary.removed, 0);
+      assert.equal(summary.filtered, 3);
+
+      const docs = await stored();
+      assert.deepEqual([...docs.keys()].sort(), Object.keys(files).sort());
+      for (const [filePath, content] of Object.entries(files)) {
+        assert.equal(docs.get(filePath).content, content);
+        assert.equal(docs.get(filePath).sha, gitBlobSha(Buffer.from(content)));
+      }
+    });
+
+    test('second run upserts changed and new files and removes deleted ones', async () => {
+      files['app.py'] += 'from pymongo import MongoClient\n';
+      files['new.py'] = 'import numpy\n';
+      delete files['README.md'];
+      writeFile(root, 'app.py', files['app.py']);
+      writeFile(root, 'new.py', files['new.py']);
+      fs.rmSync(path.join(root, 'README.md'));
+
+      const summary = await downloadRepoContents(OWNER, repo, { mode });
+      assert.ok(summary, 'ingestion failed');
+      assert.equal(summary.files, 4);
+      assert.equal(summary.fetched, 2);
+      assert.equal(summary.unchanged, 2);
+      assert.equal(summary.removed, 1);
+
+      const docs = await stored();
+      assert.deepEqual([...docs.keys()].sort(), Object.keys(files).sort());
+      assert.equal(docs.get('app.py').content, files['app.py']);
+      assert.equal(docs.get('app.py').sha, gitBlobSha(Buffer.from(files['app.py'])));
+    });
+
+    test('unchanged repo fetches nothing', async () => {
+      const summary = await downloadRepoContents(OWNER, repo, { mode });
+      assert.ok(summary, 'ingestion failed');
+      assert.equal(summary.fetched, 0);
+      assert.equal(summary.unchanged, 4);
+      assert.equal(summary.removed, 0);
+      assert.equal((await stored()).size, 4);
+    });
+  });
+}
@@ -1,17 +1,10 @@
 import fetch from 'node-fetch';
 import * as cheerio from 'cheerio';
-import { MongoClient } from 'mongodb';
-import dotenv from 'dotenv';
-
-dotenv.config({ path: '../.env' });
-
-const client = new MongoClient(process.env.MONGODB);
-const db = client.db('github_repos');
-const descriptions = db.collection('descriptions');
+import { getDb } from './db.js';
 
 export async function scrapeDescription(url, owner, repo) {
   try {
-    await client.connect();
+    const descriptions = (await getDb()).collection('descriptions');
 
     const response = await fetch(url, {
       headers: {
@@ -60,7 +53,5 @@ export async function scrapeDescription(url, owner, repo) {
   } catch (error) {
     console.error('Error:', error.message);
     return null;
-  } finally {
-    await client.close();
   }
 }
\ No newline at end of file
@@ -0,0 +1,154 @@
+import zlib from 'zlib';
+
+// Minimal streaming reader for the .tar.gz archives GitHub serves: ustar
+// headers plus the pax ('x', 'g') and GNU long-name ('L') extensions. Nothing
+// touches the disk; only entries the caller wants are held in memory.
+
+const BLOCK = 512;
+
+class ByteReader {
+  constructor(iterable) {
+    this.iterator = iterable[Symbol.asyncIterator]();
+    this.buffer = Buffer.alloc(0);
+  }
+
+  async fill(n) {
+    const parts = [this.buffer];
+    let length = this.buffer.length;
+    while (length < n) {
+      const { value, done } = await this.iterator.next();
+      if (done) {
+        return false;
+      }
+      parts.push(value);
+      length += value.length;
+    }
+    this.buffer = parts.length > 1 ? Buffer.concat(parts, length) : parts[0];
+    return true;
+  }
+
+  async read(n) {
+    if (!(await this.fill(n))) {
+      return null;
+    }
+    const out = this.buffer.subarray(0, n);
+    this.buffer = this.buffer.subarray(n);
+    return out;
+  }
+
+  // Returns false if the stream ended first
+  async skip(n) {
+    while (n > 0) {
+      if (!this.buffer.length) {
+        const { value, done } = await this.iterator.next();
+        if (done) {
+          return false;
+        }
+        this.buffer = value;
+      }
+      const k = Math.min(n, this.buffer.length);
+      this.buffer = this.buffer.subarray(k);
+      n -= k;
+    }
+    return true;
+  }
+}
+
+function text(header, start, length) {
+  const raw = header.subarray(start, start + length);
+  const end = raw.indexOf(0);
+  return raw.subarray(0, end === -1 ? length : end).toString('utf8');
+}
+
+function octal(header, start, length) {
+  return parseInt(text(header, start, length).trim() || '0', 8);
+}
+
+function parsePax(data) {
+  // Records are "<length> <key>=<value>\n"
+  const records = {};
+  let offset = 0;
+  while (offset < data.length) {
+    const space = data.indexOf(0x20, offset);
+    if (space === -1) {
+      break;
+    }
+    const length = parseInt(data.subarray(offset, space).toString('utf8'), 10);
+    if (!length) {
+      break;
+    }
+    const record = data.subarray(space + 1, offset + length - 1).toString('utf8');
+    const equals = record.indexOf('=');
+    records[record.slice(0, equals)] = record.slice(equals + 1);
+    offset += length;
+  }
+  return records;
+}
+
+// Yields { path, size, type: 'file' | 'directory' | 'other', global, content }
+// for every entry; `content` is a Buffer only for files wantContent accepts.
+// `global` carries pax global headers (GitHub puts the commit SHA in
+// global.comment).
+export async function* readTarGz(stream, { wantContent = () => true } = {}) {
+  const reader = new ByteReader(stream.pipe(zlib.createGunzip()));
+  const global = {};
+  let longPath = null;
+
+  while (true) {
+    const header = await reader.read(BLOCK);
+    // An archive ends with zero blocks; running out before them means the
+    // download was cut short and the listing is incomplete
+    if (!header) {
+      throw new Error('Archive truncated before its end-of-archive marker');
+    }
+    if (header.every((byte) => byte === 0)) {
+      return;
+    }
+
+    const size = octal(header, 124, 12);
+    const typeflag = header[156] === 0 ? '0' : String.fromCharCode(header[156]);
+    const padded = Math.ceil(size / BLOCK) * BLOCK;
+
+    if (typeflag === 'x' || typeflag === 'g' || typeflag === 'L') {
+      const extension = await reader.read(padded);
+      if (!extension) {
+        throw new Error(`Archive truncated in a '${typeflag}' header`);
+      }
+      const body = extension.subarray(0, size);
+      if (typeflag === 'L') {
+        longPath = text(body, 0, size);
+      } else if (typeflag === 'g') {
+        Object.assign(global, parsePax(body));
+      } else {
+        longPath = parsePax(body).path || longPath;
+      }
+      continue;
+    }
+
+    let entryPath = longPath;
+    if (!entryPath) {
+      const prefix = text(header, 345, 155);
+      const name = text(header, 0, 100);
+      entryPath = prefix ? `${prefix}/${name}` : name;
+    }
+    longPath = null;
+
+    const entry = {
+      path: entryPath,
+      size,
+      type: typeflag === '0' || typeflag === '7' ? 'file' : typeflag === '5' ? 'directory' : 'other',
+      global
+    };
+
+    if (entry.type === 'file' && wantContent(entry)) {
+      const body = await reader.read(padded);
+      if (!body) {
+        throw new Error(`Archive truncated in ${entryPath}`);
+      }
+      entry.content = body.subarray(0, size);
+    } else if (!(await reader.skip(padded))) {
+      throw new Error(`Archive truncated in ${entryPath}`);
+    }
+    yield entry;
+  }
+}
@@ -0,0 +1,40 @@
+// Timing spans for one analysis, mirroring backend/video/tracing.py. Each
+// span is logged as a JSON line (console.log goes to stderr in the worker)
+// and kept in `trace`, which is returned with the analysis so server.py can
+// add it to the submission's timing breakdown and /api/metrics.
+const TRACE_LOG = !['0', 'false', 'no'].includes((process.env.JUDGEJAM_TRACE_LOG || '1').toLowerCase());
+
+export function createTracer(submissionId = null) {
+  const trace = { spans: [], cache: {} };
+
+  function record(name, seconds, error = null) {
+    const entry = { span: name, seconds: Math.round(seconds * 1e4) / 1e4 };
+    if (error) {
+      entry.error = error;
+    }
+    trace.spans.push(entry);
+    if (TRACE_LOG) {
+      console.log(JSON.stringify({ submission: submissionId, ...entry }));
+    }
+  }
+
+  return {
+    trace,
+    async span(name, fn) {
+      const started = process.hrtime.bigint();
+      let error = null;
+      try {
+        return await fn();
+      } catch (e) {
+        error = e.name || 'Error';
+        throw e;
+      } finally {
+        record(name, Number(process.hrtime.bigint() - started) / 1e9, error);
+      }
+    },
+    cacheEvent(cache, hit) {
+      const counts = trace.cache[cache] || (trace.cache[cache] = { hit: 0, miss: 0 });
+      counts[hit ? 'hit' : 'miss']++;
+    }
+  };
+}
@@ -1,53 +1,115 @@
 import os
 import sys
 import json
+import argparse
+import functools
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from openai import OpenAI
-import torch
-import torchaudio
+from mongoPool import get_collection
 import numpy as np
-import librosa
 import re
-from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
-from google.cloud import vision
-import io
-from video import scores
+from concurrent.futures import ThreadPoolExecutor
+from transcriptionService import load_model, transcribe_batch, request_transcription
+from pitch import extract_pitch, extract_pitch_from_file
+from stageGraph import Stage, run_stages
+import tracing
+from audioStream import TARGET_SR, TranscriptStitcher, iter_audio_windows, iter_waveform_windows, load_wav, wav_source
 from validateClaimedTechnologies import validate_technologies
+from llmClient import complete as llm_complete
+from rubric import load_rubric
 
 load_dotenv()
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../spartan-theorem-448917-k2-7f82253f1747.json"))
-MONGODB_URI = os.getenv("MONGODB")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GOOGLE_CREDENTIALS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../spartan-theorem-448917-k2-7f82253f1747.json"))
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Used when no per-job paths are given, i.e. live capture through video.py
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_AUDIO_PATH = os.getenv("RECORDING_PATH", os.path.join(BASE_DIR, "recording.wav"))
+DEFAULT_RUBRIC_PATH = os.path.join(BASE_DIR, "rubric.pdf")
 
-print("Loading CrisperWhisper...", file=sys.stderr, flush=True)
-processor = AutoProcessor.from_pretrained("nyrahealth/CrisperWhisper")
-model = AutoModelForSpeechSeq2Seq.from_pretrained("nyrahealth/CrisperWhisper")
-model.eval()
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model.to(device)
+# When set, transcription goes to the resident transcriptionService.py instead
+# of loading CrisperWhisper into this process
+TRANSCRIPTION_SERVICE_URL = os.getenv("TRANSCRIPTION_SERVICE_URL")
+TRANSCRIBE_BATCH_SIZE = int(os.getenv("TRANSCRIBE_BATCH_SIZE", "4"))
+_asr = None
+
+def get_asr():
+    global _asr
+    if _asr is None:
+        _asr = load_model()
+    return _asr
 
 FILLER_REGEX = re.compile(
     r"\[(UM|UH|ERM|YEAH|HMM|LIKE + UM|URM|YOU KNOW|SO|ACTUALLY|BASICALLY|I MEAN)\]", re.IGNORECASE
 )
 
 def load_audio(file_path):
+    # WAV recordings are read through a memory map; other formats are decoded
+    waveform = load_wav(file_path)
+    if waveform is not None:
+        return waveform, TARGET_SR
+    import torchaudio
     waveform, sr = torchaudio.load(file_path)
     if sr != 16000:
         waveform = torchaudio.transforms.Resample(orig_freq=sr, new_freq=16000)(waveform)
         sr = 16000
     return waveform[0].numpy().astype(np.float32), sr
 
+def transcribe_windows(waveforms, sample_rate):
+    with tracing.span("asr.transcribe", windows=len(waveforms), service=bool(TRANSCRIPTION_SERVICE_URL)):
+        return _transcribe_windows(waveforms, sample_rate)
+
+def _transcribe_windows(waveforms, sample_rate):
+    if TRANSCRIPTION_SERVICE_URL:
+        # Sent concurrently so the service can micro-batch them together
+        with ThreadPoolExecutor(max_workers=len(waveforms)) as executor:
+            results = list(executor.map(
+                lambda w: request_transcription(TRANSCRIPTION_SERVICE_URL, w, sample_rate), waveforms))
+        for result in results:
+            print(f"Transcription service latency: {result['latency_ms']}ms (batch of {result['batch_size']})", file=sys.stderr, flush=True)
+        return [result["text"] for result in results]
+    return transcribe_batch(get_asr(), waveforms, sample_rate)
+
+def _stitch_windows(windows, batch_size):
+    stitcher = TranscriptStitcher()
+    batch = []
+    for window in windows:
+        batch.append(window)
+        if len(batch) == batch_size:
+            for text in transcribe_windows(batch, TARGET_SR):
+                yield stitcher.add(text)
+            batch = []
+    if batch:
+        for text in transcribe_windows(batch, TARGET_SR):
+            yield stitcher.add(text)
+
+def stream_transcription(file_path, batch_size=TRANSCRIBE_BATCH_SIZE):
+    # Yields the transcript a fragment at a time, reading the audio in
+    # overlapping 30 s windows
+    print("Transcribing audio...", file=sys.stderr, flush=True)
+    yield from _stitch_windows(iter_audio_windows(file_path), batch_size)
+
 def transcribe_audio(waveform, sample_rate):
     print("Transcribing audio...", file=sys.stderr, flush=True)
-    inputs = processor(waveform, sampling_rate=sample_rate, return_tensors="pt")
-    inputs = {k: v.to(device) for k, v in inputs.items()}
-    with torch.no_grad():
-        predicted_ids = model.generate(inputs["input_features"])
-    transcription = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
-    return transcription
+    if sample_rate != TARGET_SR:
+        raise ValueError(f"Expected {TARGET_SR} Hz audio, got {sample_rate} Hz")
+    fragments = _stitch_windows(iter_waveform_windows(waveform, sample_rate), TRANSCRIBE_BATCH_SIZE)
+    return " ".join(f for f in fragments if f)
+
+def transcribe_with_fillers(file_path):
+    # Filler counting runs on each fragment as it arrives rather than after
+    # the whole recording has been transcribed
+    fragments = []
+    filler_count = 0
+    total_words = 0
+    for fragment in stream_transcription(file_path):
+        if not fragment:
+            continue
+        fragments.append(fragment)
+        count, words, _ = detect_filler_words(fragment)
+        filler_count += count
+        total_words += words
+        print(f"Transcribed {total_words} words so far ({filler_count} fillers)", file=sys.stderr, flush=True)
+    filler_ratio = filler_count / total_words if total_words > 0 else 0
+    return " ".join(fragments), filler_count, total_words, filler_ratio
 
 def detect_filler_words(transcription):
     filler_matches = FILLER_REGEX.findall(transcription)
@@ -60,33 +122,16 @@ def detect_filler_words(transcription):
 def extract_energy(waveform):
     return np.sqrt(np.mean(waveform ** 2))
 
-def extract_pitch(waveform, sr):
-    try:
-        pitches, voiced_flag, _ = librosa.pyin(
-            waveform,
-            fmin=librosa.note_to_hz('C2'),
-            fmax=librosa.note_to_hz('C7'),
-            sr=sr,
-            hop_length=512
-        )
-    except Exception:
-        return 0.0
-    voiced_pitches = pitches[voiced_flag]
-    if len(voiced_pitches) == 0:
-        return 0.0
-    return float(np.std(voiced_pitches))
-
 def normalize(value, min_val, max_val):
     return max(0, min(1, (value - min_val) / (max_val - min_val)))
 
-def extract_rubric_text(image_path):
-    print("Extracting rubric via OCR...", file=sys.stderr, flush=True)
-    client = vision.ImageAnnotatorClient()
-    with io.open(image_path, 'rb') as image_file:
-        content = image_file.read()
-    image = vision.Image(content=content)
-    response = client.text_detection(image=image)
-    return response.text_annotations[0].description if response.text_annotations else ""
+def _rubric_stage(rubric_path):
+    # Vision OCR may run; point it at the service account only now
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_CREDENTIALS_PATH
+    return load_rubric(rubric_path)
+
+def extract_rubric_text(rubric_path):
+    return _rubric_stage(rubric_path)["text"]
 
 def score_content_against_rubric(transcript, rubric_text):
     print("Scoring content using OpenAI...", file=sys.stderr, flush=True)
@@ -100,40 +145,65 @@ Transcript:
 Score the transcript 0-100 based on rubric coverage. Be strict. Short/vague responses = low scores. Respond with a single number only.
 """
     try:
-        response = client.chat.completions.create(
+        score_str = llm_complete(
             model="gpt-4",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
-        )
-        score_str = response.choices[0].message.content.strip()
+            validate=float,
+        ).strip()
         return float(score_str)
     except Exception as e:
         print("Error during OpenAI scoring:", e)
         return 0.0
 
-def return_values():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(base_dir, "recording.wav")
-    rubric_path = os.path.join(base_dir, "rubric.pdf")
-
-    waveform, sr = load_audio(file_path)
-    transcript = transcribe_audio(waveform, sr)
-    filler_count, total_words, filler_ratio = detect_filler_words(transcript)
-    energy = extract_energy(waveform)
-    pitch_var = extract_pitch(waveform, sr)
+def _video_stage(video_path):
+    # cv2, mediapipe and DeepFace load only when video scoring actually runs
+    import video
+    return video.analyze_video_file(video_path) if video_path else video.scores()
+
+def capture_live_video():
+    # Live capture writes the recording the audio stages read and drives cv2
+    # windows, which belong to the main thread, so it runs to completion here
+    # before any stage starts. Only used when no media was given at all.
+    return _video_stage(None)
+
+def scoring_stages(audio_path, rubric_path, video_path=None, live_video=None):
+    # Audio features only need the waveform and OCR only needs the rubric, so
+    # they run alongside transcription; pyin gets its own process since it is
+    # CPU-bound Python, and reads the WAV there rather than being sent it.
+    # Only the transcript and the rubric are required; the other features
+    # score 0 when they fail, as they did before the stage graph.
+    return [
+        Stage("transcript", lambda: transcribe_with_fillers(audio_path)),
+        Stage("audio", lambda: load_audio(audio_path), default=None),
+        Stage("energy", lambda audio: extract_energy(audio[0]) if audio else 0.0, deps=["audio"], default=0.0),
+        Stage("pitch", functools.partial(extract_pitch_from_file, audio_path), executor="process", default=0.0),
+        Stage("rubric", lambda: _rubric_stage(rubric_path)),
+        Stage("rubric_score", lambda t, rubric: score_content_against_rubric(t[0], rubric["text"]),
+              deps=["transcript", "rubric"], default=0.0),
+        # Uploaded videos are scored offline; without one, the scores of the
+        # finished capture_live_video() session are passed in. Audio-only
+        # media has no frames to score.
+        Stage("video", lambda: _video_stage(video_path) if video_path else live_video or {}, default={}),
+    ]
+
+def combine_scores(results):
+    transcript, filler_count, total_words, filler_ratio = results["transcript"]
+    energy = results["energy"]
+    pitch_var = results["pitch"]
+    rubric_text = results["rubric"]["text"]
+    rubric_score = results["rubric_score"]
+    video_metrics = results["video"]
 
     norm_filler = 1 - min(filler_ratio * 10, 1)
     norm_energy = normalize(energy, 0.01, 0.1)
     norm_pitch = normalize(pitch_var, 0, 50)
     fluency_component_score = (norm_filler + norm_energy + norm_pitch) / 3 * 100
 
-    rubric_text = extract_rubric_text(rubric_path)
     print("\nExtracted Rubric Text:\n", rubric_text, file=sys.stderr, flush=True)
-    rubric_score = score_content_against_rubric(transcript, rubric_text)
 
     combined_audio_score = (0.5 * rubric_score) + (0.5 * fluency_component_score)
 
-    video_metrics = scores()
     video_score = video_metrics.get("final_score", 0.0)
     final_score = (combined_audio_score + video_score) / 2
 
@@ -156,11 +226,26 @@ def return_values():
 
     return float(final_score.__round__(2) * 100), final_rating, transcript
 
+def _print_timings(stage_timings):
+    print("Stage timings:", ", ".join(f"{k}={v:.2f}s" for k, v in stage_timings.items()), file=sys.stderr, flush=True)
+
+def return_values(audio_path=None, rubric_path=None, video_path=None):
+    live_video = capture_live_video() if not (audio_path or video_path) else None
+    audio_path = audio_path or DEFAULT_AUDIO_PATH
+    rubric_path = rubric_path or DEFAULT_RUBRIC_PATH
+
+    # Uploaded media is decoded once into a WAV that transcription and the
+    # audio features both read from disk
+    with wav_source(audio_path) as wav_path:
+        results, stage_timings = run_stages(scoring_stages(wav_path, rubric_path, video_path, live_video),
+                                            trace_prefix="scoring")
+    final_score, final_rating, transcript = combine_scores(results)
+    _print_timings(stage_timings)
+    return final_score, final_rating, transcript, stage_timings
+
 def fetch_description_from_mongodb(project_id: str):
     print("Fetching project description from MongoDB...", file=sys.stderr, flush=True)
-    mongo_client = MongoClient(MONGODB_URI)
-    db = mongo_client["github_repos"]
-    collection = db["descriptions"]
+    collection = get_collection("descriptions")
     doc = collection.find_one({"owner_repo": project_id})
     if doc and "description" in doc:
         return doc["description"]
@@ -168,6 +253,10 @@ def fetch_description_from_mongodb(project_id: str):
         print(f"No description found for project_id '{project_id}'.", file=sys.stderr, flush=True)
         return None
 
+def _parse_comparison(content):
+    data = json.loads(content.strip())
+    return data.get("alignment_score", 0), data.get("claimed_technologies", [])
+
 def compare_with_openai(transcript: str, description: str):
     prompt = f"""
 Transcript:
@@ -186,14 +275,13 @@ Respond in JSON:
 }}
 """
     try:
-        response = client.chat.completions.create(
+        content = llm_complete(
             model="gpt-4",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
+            validate=_parse_comparison,
         )
-        content = response.choices[0].message.content.strip()
-        data = json.loads(content)
-        return data.get("alignment_score", 0), data.get("claimed_technologies", [])
+        return _parse_comparison(content)
     except Exception as e:
         print("Error in compare_with_openai:", e, file=sys.stderr, flush=True)
         return 0, []
@@ -206,16 +294,44 @@ def generate_feedback(score):
     else:
         return "The transcript does not match the description well. Significant improvements are needed."
 
-def main(project_id: str):
-    final_score, _, transcript = return_values()
-    description = fetch_description_from_mongodb(project_id)
+def _compare_stage(transcript_result, description):
+    if not description:
+        return 0, []
+    return compare_with_openai(transcript_result[0], description)
+
+def main(project_id: str, audio_path=None, rubric_path=None, video_path=None):
+    # The trace goes back with the result; server.py adds it to the
+    # submission's timing breakdown and /api/metrics
+    with tracing.collect() as trace:
+        result = _main(project_id, audio_path, rubric_path, video_path)
+    result["trace"] = trace
+    return result
+
+def _main(project_id, audio_path=None, rubric_path=None, video_path=None):
+    live_video = capture_live_video() if not (audio_path or video_path) else None
+    audio_path = audio_path or DEFAULT_AUDIO_PATH
+    rubric_path = rubric_path or DEFAULT_RUBRIC_PATH
+
+    # The rubric-scoring and comparison prompts only need the transcript, so
+    # they go out together; validation needs the claimed technologies first
+    with wav_source(audio_path) as wav_path:
+        results, stage_timings = run_stages(scoring_stages(wav_path, rubric_path, video_path, live_video) + [
+            Stage("description", lambda: fetch_description_from_mongodb(project_id), default=None),
+            Stage("comparison", _compare_stage, deps=["transcript", "description"], default=(0, [])),
+            Stage("validation", lambda description, comparison:
+                  validate_technologies(comparison[1], project_id) if description else None,
+                  deps=["description", "comparison"], default=None),
+        ], trace_prefix="scoring")
+    final_score, _, transcript = combine_scores(results)
+    _print_timings(stage_timings)
+
+    description = results["description"]
     if not description:
         return {"error": "Description not found in MongoDB."}
 
-    similarity_score, claimed_tech = compare_with_openai(transcript, description)
+    similarity_score, claimed_tech = results["comparison"]
     feedback = generate_feedback(similarity_score)
-
-    validation_result = validate_technologies(project_id, claimed_tech)
+    validation_result = results["validation"]
 
     print("\n=== Comparison Results ===", file=sys.stderr, flush=True)
     print(f"Similarity Score: {similarity_score:.2f}", file=sys.stderr, flush=True)
@@ -228,17 +344,26 @@ def main(project_id: str):
         "similarity_score": similarity_score,
         "feedback": feedback,
         "claimed_technologies": claimed_tech,
-        "validation": validation_result
+        "validation": validation_result,
+        "rubric_criteria": results["rubric"]["criteria"],
+        "video_metrics": results["video"],
+        "stage_timings": stage_timings
     }
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("owner", nargs="?")
+    parser.add_argument("repo", nargs="?")
+    parser.add_argument("--audio", help="recording to score (default: recording.wav next to this script)")
+    parser.add_argument("--rubric", help="rubric PDF or image (default: rubric.pdf next to this script)")
+    parser.add_argument("--video", help="pitch video to score offline (default: live webcam capture)")
+    args = parser.parse_args()
+
+    if not args.owner or not args.repo:
         print(json.dumps({"error": "Owner and repo arguments missing"}), file=sys.stderr, flush=True)
         sys.exit(1)
 
-    owner = sys.argv[1]
-    repo = sys.argv[2]
-    project_id = f"{owner}_{repo}"
+    project_id = f"{args.owner}_{args.repo}"
 
-    result = main(project_id)
+    result = main(project_id, audio_path=args.audio, rubric_path=args.rubric, video_path=args.video)
     print(json.dumps(result))
\ No newline at end of file
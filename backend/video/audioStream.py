@@ -0,0 +1,298 @@
+import os
+import re
+import sys
+import wave
+import shutil
+import struct
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+
+TARGET_SR = 16000
+# Whisper's feature extractor sees at most 30 s per input
+WINDOW_SECONDS = 30
+OVERLAP_SECONDS = 5
+STITCH_MAX_WORDS = 30
+WAV_FLUSH_SECONDS = float(os.getenv("WAV_FLUSH_SECONDS", "1"))
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+
+def _pcm_to_float(raw, sample_width, channels):
+    if sample_width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        data = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        data = np.where(data & 0x800000, data - 0x1000000, data).astype(np.float32) / 8388608
+    elif sample_width == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+    # Match load_audio: keep the first channel only
+    return data.reshape(-1, channels)[:, 0]
+
+
+def _resample(waveform, sr):
+    if sr == TARGET_SR:
+        return waveform
+    import torch
+    import torchaudio
+    return torchaudio.functional.resample(torch.from_numpy(np.ascontiguousarray(waveform)), sr, TARGET_SR).numpy()
+
+
+def iter_waveform_windows(waveform, sr=TARGET_SR, window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    window = int(window_seconds * sr)
+    step = window - int(overlap_seconds * sr)
+    start = 0
+    while len(waveform):
+        yield waveform[start:start + window]
+        if start + window >= len(waveform):
+            break
+        start += step
+
+
+def iter_wav_windows(file_path, window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    # Reads only one window (plus overlap) at a time, so memory stays flat
+    # however long the recording is.
+    with wave.open(file_path, "rb") as wf:
+        sr = wf.getframerate()
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        window = int(window_seconds * sr)
+        step = window - int(overlap_seconds * sr)
+
+        buffer = np.empty(0, dtype=np.float32)
+        while True:
+            need = window - len(buffer)
+            chunk = _pcm_to_float(wf.readframes(need), sample_width, channels)
+            # Nothing new: an empty file, or the last window ended exactly at EOF
+            if len(chunk) == 0:
+                break
+            buffer = np.concatenate([buffer, chunk])
+            yield _resample(buffer, sr).astype(np.float32)
+            if len(chunk) < need:
+                break
+            buffer = buffer[step:]
+
+
+def is_wav(file_path):
+    try:
+        with wave.open(file_path, "rb"):
+            return True
+    except (wave.Error, EOFError):
+        return False
+
+
+def _transcode_ffmpeg(file_path, out_path):
+    # ffmpeg decodes and writes as it goes, so memory stays flat
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", file_path,
+         "-vn", "-ac", "1", "-ar", str(TARGET_SR), "-c:a", "pcm_s16le", out_path],
+        check=True,
+    )
+
+
+def _transcode_torchaudio(file_path, out_path):
+    import torchaudio
+    waveform, sr = torchaudio.load(file_path)
+    waveform = _resample(waveform[0].numpy().astype(np.float32), sr)
+    with WavWriter(out_path, 1, 2, TARGET_SR) as writer:
+        for start in range(0, len(waveform), TARGET_SR * WINDOW_SECONDS):
+            chunk = waveform[start:start + TARGET_SR * WINDOW_SECONDS]
+            writer.write((np.clip(chunk, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def _transcode_wave(file_path, out_path):
+    # WAVs the window reader handles but the memory map doesn't (24-bit PCM)
+    # are rewritten as 16-bit without a decoder
+    with WavWriter(out_path, 1, 2, TARGET_SR) as writer:
+        for chunk in iter_wav_windows(file_path, overlap_seconds=0):
+            writer.write((np.clip(chunk, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+@contextmanager
+def wav_source(file_path, directory=None):
+    # Yields a WAV path for `file_path`. Compressed or container formats (e.g.
+    # uploaded videos) are decoded once into a temporary 16 kHz mono WAV that
+    # the window iterator and load_audio() can both read from disk; it is
+    # removed on exit. WAVs only pass through when both the window reader and
+    # the memory map can read them; 24-bit, float and WAVE_FORMAT_EXTENSIBLE
+    # files are transcoded too.
+    readable = is_wav(file_path)
+    if readable and _wav_layout(file_path) is not None:
+        yield file_path
+        return
+    fd, out_path = tempfile.mkstemp(prefix="audio-", suffix=".wav", dir=directory)
+    os.close(fd)
+    try:
+        if readable:
+            _transcode_wave(file_path, out_path)
+        elif shutil.which("ffmpeg"):
+            _transcode_ffmpeg(file_path, out_path)
+        else:
+            print("ffmpeg not found; decoding audio in memory", file=sys.stderr, flush=True)
+            _transcode_torchaudio(file_path, out_path)
+        yield out_path
+    finally:
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+
+
+def iter_audio_windows(file_path, window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    with wav_source(file_path) as wav_path:
+        yield from iter_wav_windows(wav_path, window_seconds, overlap_seconds)
+
+
+def _wav_layout(file_path):
+    # Walks the RIFF chunks for the format and the offset of the sample data.
+    # Returns None for anything that isn't plain PCM or 32-bit float.
+    with open(file_path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(size - 16 + (size & 1), 1)
+            elif chunk_id == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), 1)
+        file_size = os.fstat(f.fileno()).st_size
+
+    if fmt is None:
+        return None
+    tag, channels, sr, _, block_align, bits = fmt
+    if tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        dtype = "<f4"
+    elif tag == WAVE_FORMAT_PCM and bits in (8, 16, 32):
+        dtype = {8: "u1", 16: "<i2", 32: "<i4"}[bits]
+    else:
+        return None
+
+    # A recording that was cut off may not have had its size patched yet
+    size = min(size, file_size - offset) if size else file_size - offset
+    return {
+        "offset": offset,
+        "frames": size // block_align,
+        "channels": channels,
+        "sr": sr,
+        "dtype": dtype,
+    }
+
+
+def wav_view(file_path):
+    # Memory-mapped (frames, channels) view of a WAV file's samples in their
+    # stored dtype; nothing is read until it is indexed. None if unsupported.
+    layout = _wav_layout(file_path)
+    if layout is None:
+        return None
+    shape = (layout["frames"], layout["channels"])
+    if layout["frames"] == 0:
+        return np.empty(shape, dtype=layout["dtype"]), layout["sr"]
+    return np.memmap(file_path, dtype=layout["dtype"], mode="r", offset=layout["offset"], shape=shape), layout["sr"]
+
+
+def load_wav(file_path):
+    # First channel as float32 at TARGET_SR, straight from the memory map.
+    # 32-bit float mono recordings at TARGET_SR come back as the map itself;
+    # integer PCM costs one vectorised scale pass and no decoder.
+    view = wav_view(file_path)
+    if view is None:
+        return None
+    samples, sr = view
+    channel = samples[:, 0]
+    if samples.dtype == np.float32:
+        waveform = channel
+    elif samples.dtype == np.uint8:
+        waveform = (channel.astype(np.float32) - 128) / 128
+    else:
+        waveform = channel.astype(np.float32) / float(2 ** (8 * samples.dtype.itemsize - 1))
+    return _resample(waveform, sr).astype(np.float32, copy=False)
+
+
+class WavWriter:
+    # Streams a recording to disk chunk by chunk. The wave module rewrites the
+    # header sizes on every write, so the file is a valid WAV at all times and
+    # a crash loses at most the last unflushed WAV_FLUSH_SECONDS.
+
+    def __init__(self, path, channels, sample_width, rate, flush_seconds=WAV_FLUSH_SECONDS):
+        self.path = path
+        self._file = open(path, "wb")
+        self._wav = wave.open(self._file, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(sample_width)
+        self._wav.setframerate(rate)
+        self._flush_bytes = max(1, int(flush_seconds * rate)) * channels * sample_width
+        self._unflushed = 0
+        self._lock = threading.Lock()
+        self.bytes_written = 0
+
+    def write(self, data):
+        with self._lock:
+            self._wav.writeframes(data)
+            self.bytes_written += len(data)
+            self._unflushed += len(data)
+            if self._unflushed >= self._flush_bytes:
+                self._file.flush()
+                self._unflushed = 0
+
+    def view(self):
+        # Everything recorded so far, as a NumPy view over the file
+        with self._lock:
+            self._file.flush()
+        return wav_view(self.path)[0]
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._wav.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w\[\]]", "", word.lower())
+
+
+class TranscriptStitcher:
+    # Overlapping windows transcribe the same few seconds twice. Each new
+    # window's text is trimmed by the longest run of words that repeats the
+    # end of what has already been emitted.
+
+    def __init__(self, max_words=STITCH_MAX_WORDS):
+        self.max_words = max_words
+        self.tail = []
+
+    def add(self, text):
+        words = text.split()
+        normalized = [_normalize_word(w) for w in words]
+
+        overlap = 0
+        for k in range(min(len(self.tail), len(normalized), self.max_words), 0, -1):
+            if self.tail[-k:] == normalized[:k]:
+                overlap = k
+                break
+
+        self.tail = (self.tail + normalized[overlap:])[-self.max_words:]
+        return " ".join(words[overlap:])
@@ -0,0 +1,506 @@
+import os
+import sys
+import json
+import math
+import time
+import wave
+import shutil
+import argparse
+import tempfile
+import resource
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Offline benchmark for the judging pipeline. Everything external is faked:
+# Mongo is mongomock, GPT-4 is fakeOpenAIServer.py, Vision OCR and the ASR
+# model are in-process stand-ins, and GitHub/the Node worker are skipped.
+# Audio, rubric and (when cv2 is installed) video fixtures are synthesized.
+#   python benchmark.py [--sizes small,medium] [--repeat 3] [--concurrency 4]
+#                       [--json out.json] [--baseline old.json]
+# Two phases run: NeuralNetwork.main() per fixture size, reporting per-stage
+# latency; then N concurrent /api/submit requests through frontend/server.py
+# and its job queue, reporting throughput and per-job latency. Peak RSS is
+# sampled in each phase.
+FIXTURE_SIZES = {
+    # name: (audio seconds, rubric criteria, repo files)
+    "small": (30, 4, 20),
+    "medium": (120, 8, 80),
+    "large": (600, 16, 300),
+}
+SAMPLE_RATE = 16000
+VIDEO_FPS = 15
+VIDEO_SIZE = (320, 240)
+# Stage medians below this are noise when comparing with a baseline
+REGRESSION_FLOOR_SECONDS = 0.05
+
+ASR_VOCABULARY = ["we", "built", "a", "tool", "that", "scores", "pitches", "[UM]", "using", "python", "react",
+                  "and", "mongodb", "[UH]", "it", "helps", "judges", "compare", "teams", "quickly"]
+RUBRIC_TOPICS = ["Innovation", "Technical Complexity", "Design", "Impact", "Presentation", "Completeness",
+                 "Use of APIs", "Scalability"]
+
+
+class RssSampler:
+    # Peak resident set size of this process while the block runs
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+
+    @staticmethod
+    def current_kb():
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_kb = self.current_kb()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+        return False
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    p95 = values[min(len(values) - 1, math.ceil(0.95 * len(values)) - 1)]
+    return {"median": round(float(np.median(values)), 4), "p95": round(p95, 4), "max": round(values[-1], 4),
+            "n": len(values)}
+
+
+# Fixtures
+
+def write_speech_wav(path, seconds, seed=0):
+    # Voiced "syllables" (a few harmonics over a gliding f0) separated by
+    # pauses, written a second at a time
+    rng = np.random.default_rng(seed)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        phase = 0.0
+        for second in range(seconds):
+            t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+            f0 = 110 + 60 * np.sin(2 * np.pi * (second + t) / 7) + rng.normal(0, 3)
+            phases = phase + 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+            phase = float(phases[-1])
+            voice = sum(np.sin(k * phases) / k for k in (1, 2, 3))
+            syllables = (np.sin(2 * np.pi * 4 * t) > -0.2).astype(np.float32)
+            if second % 5 == 4:
+                syllables[SAMPLE_RATE // 2:] = 0
+            signal = 0.3 * voice * syllables + rng.normal(0, 0.005, SAMPLE_RATE)
+            wav.writeframes((np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def write_rubric(path, criteria):
+    # Not a real image: the fake Vision client reads the text after the PNG
+    # signature, which keeps the rubric in the OCR path like a scanned one
+    lines = []
+    for i in range(criteria):
+        topic = RUBRIC_TOPICS[i % len(RUBRIC_TOPICS)] + (f" {i // len(RUBRIC_TOPICS) + 1}" if i >= len(RUBRIC_TOPICS) else "")
+        lines.append(f"{topic} - {100 // criteria}%")
+        lines.append(f"How well the project demonstrates {topic.lower()}.")
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + "\n".join(lines).encode("utf-8"))
+
+
+def video_supported():
+    return all(importlib.util.find_spec(name) for name in ("cv2", "mediapipe", "deepface"))
+
+
+def write_video(path, seconds):
+    import cv2
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, VIDEO_SIZE)
+    width, height = VIDEO_SIZE
+    for i in range(seconds * VIDEO_FPS):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        x = int(width / 2 + width / 4 * math.sin(i / VIDEO_FPS))
+        cv2.circle(frame, (x, height // 3), 24, (180, 200, 220), -1)
+        cv2.rectangle(frame, (x - 40, height // 3 + 30), (x + 40, height - 10), (90, 90, 160), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def repo_files(owner_repo, count):
+    from codeIndex import file_terms
+    templates = [
+        ("app.py", "from flask import Flask, request\nfrom pymongo import MongoClient\n\napp = Flask(__name__)\n"),
+        ("package.json", json.dumps({"dependencies": {"react": "^18.0.0", "react-dom": "^18.0.0"}})),
+        ("src/App.jsx", "import React, { useState } from 'react';\nexport default function App() { return null; }\n"),
+    ]
+    docs = []
+    for i in range(count):
+        if i < len(templates):
+            path, content = templates[i]
+        else:
+            path = f"src/module_{i}.py"
+            content = "\n".join(f"def handler_{i}_{j}(payload):\n    return score_pitch(payload, weight={j})\n" for j in range(20))
+        terms, term_count = file_terms(content)
+        docs.append({"owner_repo": owner_repo, "path": path, "content": content, "terms": terms,
+                     "term_count": term_count, "sha": f"{i:040x}"})
+    return docs
+
+
+def make_fixtures(root, sizes, with_video):
+    fixtures = {}
+    for name in sizes:
+        seconds, criteria, files = FIXTURE_SIZES[name]
+        audio_path = os.path.join(root, f"pitch_{name}.wav")
+        rubric_path = os.path.join(root, f"rubric_{name}.png")
+        write_speech_wav(audio_path, seconds)
+        write_rubric(rubric_path, criteria)
+        video_path = None
+        if with_video:
+            video_path = os.path.join(root, f"pitch_{name}.mp4")
+            write_video(video_path, seconds)
+        fixtures[name] = {"audio": audio_path, "rubric": rubric_path, "video": video_path, "files": files,
+                          "seconds": seconds}
+    return fixtures
+
+
+def seed_project(owner, repo, files):
+    import mongoPool
+    owner_repo = f"{owner}_{repo}"
+    mongoPool.get_collection("descriptions").update_one(
+        {"owner_repo": owner_repo},
+        {"$set": {"owner_repo": owner_repo, "owner": owner, "repo": repo,
+                  "description": "A pitch scoring tool built with Python, React and MongoDB."}},
+        upsert=True,
+    )
+    collection = mongoPool.get_collection("files")
+    collection.delete_many({"owner_repo": owner_repo})
+    collection.insert_many(repo_files(owner_repo, files))
+
+
+# Fakes
+
+class StubASR:
+    # Stands in for CrisperWhisper: one word per voiced 0.4 s frame, with an
+    # optional fixed cost per 30 s window
+    def __init__(self, seconds_per_window=0.0):
+        self.seconds_per_window = seconds_per_window
+        self.windows = 0
+        self._lock = threading.Lock()
+
+    def transcribe_batch(self, asr, waveforms, sample_rate):
+        texts = []
+        for waveform in waveforms:
+            frame = int(0.4 * sample_rate)
+            usable = len(waveform) // frame * frame
+            energy = np.sqrt(np.mean(np.asarray(waveform[:usable], dtype=np.float32).reshape(-1, frame) ** 2, axis=1))
+            words = [ASR_VOCABULARY[i % len(ASR_VOCABULARY)] for i in np.flatnonzero(energy > 0.02)]
+            texts.append(" ".join(words))
+            if self.seconds_per_window:
+                time.sleep(self.seconds_per_window)
+        with self._lock:
+            self.windows += len(waveforms)
+        return texts
+
+
+class FakeVision:
+    # Replaces rubric._ocr_text; returns the text embedded by write_rubric()
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def ocr_text(self, path, is_pdf):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        with open(path, "rb") as f:
+            return f.read()[8:].decode("utf-8", errors="ignore")
+
+
+def stub_video_scores():
+    return {"emotion_score": 50.0, "gesture_score": 50.0, "posture_score": 50.0, "movement_score": 50.0,
+            "final_score": 50.0, "emotion_counts": {}, "stubbed": True}
+
+
+class InProcessAnalysisWorker:
+    # Takes the Node worker's place behind server.py: no GitHub or description
+    # fetch, just the scoring script's work, run in this process
+    def call(self, method, params=None, timeout=None, on_progress=None):
+        import NeuralNetwork
+        if method == "health":
+            return {"ok": True, "pid": os.getpid()}
+        if method != "getRepoCreationDate":
+            raise ValueError(f"Unsupported method: {method}")
+        if on_progress:
+            on_progress("scoring")
+        result = NeuralNetwork.main(f"{params['owner']}_{params['repo']}", audio_path=params.get("audioPath"),
+                                    rubric_path=params.get("rubricPath"), video_path=params.get("videoPath"))
+        return {"status": "success", "isValid": True, "isDisqualified": False,
+                "details": {"neuralNetwork": result}}
+
+    def close(self):
+        pass
+
+
+def install_fakes(args, work_dir):
+    # Environment first: these are read when the pipeline modules import
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["RUBRIC_CACHE_DIR"] = os.path.join(work_dir, "rubric_cache")
+    os.environ["JUDGEJAM_MEDIA_DIR"] = os.path.join(work_dir, "media")
+    os.environ["JUDGEJAM_WORK_DIR"] = os.path.join(work_dir, "jobs")
+    os.environ["JUDGEJAM_WORKERS"] = str(args.concurrency)
+    os.environ["PITCH_BACKEND"] = args.pitch_backend
+    os.environ.pop("TRANSCRIPTION_SERVICE_URL", None)
+    if args.llm_cache:
+        os.environ["LLM_CACHE_PATH"] = os.path.join(work_dir, "llm_cache.sqlite3")
+    else:
+        os.environ["LLM_CACHE_DISABLED"] = "1"
+
+    from fakeOpenAIServer import start_server
+    openai_server, openai_state = start_server(port=0, latency=args.llm_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_server.server_address[1]}/v1"
+
+    import mongomock
+    import mongoPool
+    mongoPool._client = mongomock.MongoClient()
+    mongoPool._client_pid = os.getpid()
+
+    import rubric
+    import NeuralNetwork
+    asr = StubASR(args.asr_latency)
+    vision = FakeVision(args.ocr_latency)
+    NeuralNetwork.transcribe_batch = asr.transcribe_batch
+    NeuralNetwork.get_asr = lambda: None
+    rubric._ocr_text = vision.ocr_text
+
+    real_video_stage = NeuralNetwork._video_stage
+    with_video = args.video and video_supported()
+
+    # Audio-only media never reaches this: the server and scoring_stages
+    # route it past video scoring, and bench_submissions checks that they do
+    def video_stage(video_path):
+        if with_video and video_path:
+            return real_video_stage(video_path)
+        return stub_video_scores()
+
+    NeuralNetwork._video_stage = video_stage
+    return {"openai": openai_state, "asr": asr, "vision": vision, "with_video": with_video}, openai_server
+
+
+# Phases
+
+def bench_pipeline(fixtures, repeat):
+    import NeuralNetwork
+    report = {}
+    for name, fixture in fixtures.items():
+        seed_project("bench", name, fixture["files"])
+        stage_times = {}
+        wall = []
+        with RssSampler() as rss:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = NeuralNetwork.main(f"bench_{name}", audio_path=fixture["audio"],
+                                            rubric_path=fixture["rubric"], video_path=fixture["video"])
+                wall.append(time.perf_counter() - started)
+                if "error" in result:
+                    raise RuntimeError(f"Pipeline failed on {name}: {result['error']}")
+                for stage, seconds in result["stage_timings"].items():
+                    stage_times.setdefault(stage, []).append(seconds)
+        report[name] = {
+            "audio_seconds": fixture["seconds"],
+            "wall": summarize(wall),
+            "stages": {stage: summarize(times) for stage, times in stage_times.items()},
+            "peak_rss_mb": round(rss.peak_kb / 1024, 1),
+        }
+        print(f"pipeline {name}: {report[name]['wall']['median']:.2f}s median over {repeat} run(s)",
+              file=sys.stderr, flush=True)
+    return report
+
+
+def bench_submissions(fixture, concurrency, submissions):
+    from datetime import datetime
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, "..", "..", "frontend"))
+    import server
+    import jobqueue
+
+    server.analysis_workers = InProcessAnalysisWorker()
+    for i in range(submissions):
+        seed_project("bench", f"submit{i}", fixture["files"])
+
+    def submit(i):
+        client = server.app.test_client()
+        started = time.perf_counter()
+        with open(fixture["audio"], "rb") as media, open(fixture["rubric"], "rb") as rubric_file:
+            # Distinct repos, so identical-submission dedupe doesn't collapse them
+            response = client.post("/api/submit", content_type="multipart/form-data", data={
+                "githubUrl": f"https://github.com/bench/submit{i}",
+                "descriptionUrl": "https://devpost.com/software/bench",
+                "eventStartDate": "2024-01-01T00:00:00Z",
+                "rubric": (rubric_file, "rubric.png"),
+                "media": (media, "pitch.wav"),
+            })
+        if response.status_code != 202:
+            raise RuntimeError(f"Submit failed: {response.status_code} {response.get_data(as_text=True)}")
+        return response.get_json()["resultId"], time.perf_counter() - started
+
+    def seconds_between(doc, start, end):
+        if start not in doc or end not in doc:
+            return None
+        return (datetime.fromisoformat(doc[end]) - datetime.fromisoformat(doc[start])).total_seconds()
+
+    from bson.objectid import ObjectId
+    server.job_queue.start()
+    try:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                submitted = list(executor.map(submit, range(submissions)))
+            ids = [ObjectId(result_id) for result_id, _ in submitted]
+            finished = {}
+            while len(finished) < len(ids):
+                for doc in server.results_col.find({"_id": {"$in": ids}, "status": {"$in": [jobqueue.DONE, jobqueue.FAILED]}}):
+                    finished.setdefault(doc["_id"], (doc, time.perf_counter() - started))
+                time.sleep(0.05)
+            wall = time.perf_counter() - started
+    finally:
+        server.job_queue.stop()
+
+    docs = [doc for doc, _ in finished.values()]
+    failed = [doc for doc in docs if doc["status"] == jobqueue.FAILED]
+    for doc in failed:
+        print(f"Submission {doc['_id']} failed: {doc.get('error')}", file=sys.stderr, flush=True)
+    # pitch.wav has no frames, so it must come back without video scores
+    for doc in docs:
+        scoring = ((doc.get("repoAnalysis") or {}).get("details") or {}).get("neuralNetwork") or {}
+        if scoring.get("video_metrics"):
+            raise RuntimeError(f"Audio-only submission {doc['_id']} was scored as video")
+    queue_wait = [seconds_between(doc, "queuedAt", "analyzingAt") for doc in docs]
+    analysis = [seconds_between(doc, "analyzingAt", "doneAt") for doc in docs]
+    return {
+        "submissions": submissions,
+        "concurrency": concurrency,
+        "failed": len(failed),
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(60 * submissions / wall, 2),
+        "submit_request": summarize([seconds for _, seconds in submitted]),
+        "queue_wait": summarize([s for s in queue_wait if s is not None]),
+        "analysis": summarize([s for s in analysis if s is not None]),
+        "end_to_end": summarize([seconds for _, seconds in finished.values()]),
+        "peak_rss_mb": round(rss.peak_kb / 1024, 1),
+    }
+
+
+def compare(report, baseline, tolerance):
+    # Stage or end-to-end medians that got slower than the baseline allows
+    regressions = []
+
+    def check(label, current, previous):
+        if current is None or previous is None or current - previous < REGRESSION_FLOOR_SECONDS:
+            return
+        if current > previous * (1 + tolerance):
+            regressions.append(f"{label}: {previous:.3f}s -> {current:.3f}s")
+
+    for name, sized in report.get("pipeline", {}).items():
+        old = baseline.get("pipeline", {}).get(name)
+        if not old:
+            continue
+        check(f"pipeline {name} wall", sized["wall"].get("median"), old["wall"].get("median"))
+        for stage, stats in sized["stages"].items():
+            check(f"pipeline {name} {stage}", stats.get("median"), old["stages"].get(stage, {}).get("median"))
+    current, old = report.get("submissions"), baseline.get("submissions")
+    if current and old and current["concurrency"] == old["concurrency"]:
+        check("submissions end_to_end", current["end_to_end"].get("median"), old["end_to_end"].get("median"))
+        if current["throughput_per_minute"] < old["throughput_per_minute"] / (1 + tolerance):
+            regressions.append(f"throughput: {old['throughput_per_minute']}/min -> {current['throughput_per_minute']}/min")
+    return regressions
+
+
+def print_report(report):
+    for name, sized in report.get("pipeline", {}).items():
+        print(f"\n== pipeline: {name} ({sized['audio_seconds']}s audio, peak RSS {sized['peak_rss_mb']} MB)")
+        print(f"{'stage':<14}{'median':>10}{'p95':>10}{'max':>10}")
+        for stage, stats in [("wall", sized["wall"])] + sorted(sized["stages"].items(), key=lambda item: -item[1]["median"]):
+            print(f"{stage:<14}{stats['median']:>10.3f}{stats['p95']:>10.3f}{stats['max']:>10.3f}")
+    submissions = report.get("submissions")
+    if submissions:
+        print(f"\n== submissions: {submissions['submissions']} at concurrency {submissions['concurrency']} "
+              f"({submissions['failed']} failed, peak RSS {submissions['peak_rss_mb']} MB)")
+        print(f"throughput: {submissions['throughput_per_minute']} submissions/min over {submissions['wall_seconds']}s")
+        for label in ("submit_request", "queue_wait", "analysis", "end_to_end"):
+            stats = submissions[label]
+            if stats:
+                print(f"{label:<14}{stats['median']:>10.3f}{stats['p95']:>10.3f}{stats['max']:>10.3f}")
+    fakes = report["fakes"]
+    print(f"\nfake calls: {fakes['llm_requests']} LLM, {fakes['ocr_requests']} OCR, {fakes['asr_windows']} ASR windows; "
+          f"video {'analyzed' if fakes['video'] else 'stubbed'}; children peak RSS {report['children_peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="small,medium", help=f"comma-separated, from {', '.join(FIXTURE_SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="pipeline runs per size")
+    parser.add_argument("--concurrency", type=int, default=4, help="queue workers and parallel submit requests")
+    parser.add_argument("--submissions", type=int, help="submissions for the throughput phase (default: 2x concurrency)")
+    parser.add_argument("--submit-size", default="small", help="fixture size used for submissions")
+    parser.add_argument("--skip-submit", action="store_true")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake GPT-4 seconds per call")
+    parser.add_argument("--ocr-latency", type=float, default=0.3, help="fake Vision seconds per call")
+    parser.add_argument("--asr-latency", type=float, default=0.0, help="stand-in ASR seconds per 30 s window")
+    parser.add_argument("--pitch-backend", default=os.getenv("PITCH_BACKEND", "pyin"), choices=["pyin", "yin"])
+    parser.add_argument("--llm-cache", action="store_true", help="enable the LLM cache (fresh per run)")
+    parser.add_argument("--video", action="store_true", help="score synthetic videos when cv2/mediapipe/deepface are installed")
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--baseline", help="earlier --json report; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --baseline")
+    parser.add_argument("--keep", action="store_true", help="keep the fixture directory")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes + [args.submit_size] if s not in FIXTURE_SIZES]
+    if unknown:
+        parser.error(f"unknown fixture size(s): {', '.join(unknown)}")
+
+    work_dir = tempfile.mkdtemp(prefix="judgejam-bench-")
+    try:
+        fakes, openai_server = install_fakes(args, work_dir)
+        fixtures = make_fixtures(work_dir, sorted(set(sizes + [args.submit_size]), key=list(FIXTURE_SIZES).index),
+                                 fakes["with_video"])
+
+        report = {"config": vars(args), "pipeline": bench_pipeline({s: fixtures[s] for s in sizes}, args.repeat)}
+        if not args.skip_submit:
+            report["submissions"] = bench_submissions(fixtures[args.submit_size], args.concurrency,
+                                                      args.submissions or 2 * args.concurrency)
+        report["fakes"] = {"llm_requests": fakes["openai"].requests, "ocr_requests": fakes["vision"].requests,
+                           "asr_windows": fakes["asr"].windows, "video": fakes["with_video"]}
+        report["children_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+        openai_server.shutdown()
+    finally:
+        if args.keep:
+            print(f"Fixtures kept in {work_dir}", file=sys.stderr, flush=True)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
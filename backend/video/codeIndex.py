@@ -0,0 +1,131 @@
+import re
+import math
+from collections import Counter
+from techScan import TECH_SIGNATURES, normalize_claim
+
+# Must match tokenize() in backend/repoFiles.js, which stores each file's
+# term counts at ingestion so the index here is built without re-reading code
+TOKEN_REGEX = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+CAMEL_REGEX = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z0-9]+")
+MAX_TERMS_PER_FILE = 500
+STOPWORDS = {
+    "the", "and", "for", "if", "else", "return", "import", "from", "const", "let", "var", "def", "class",
+    "function", "this", "self", "new", "true", "false", "null", "none", "is", "in", "of", "to", "as", "with",
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_LINES = 24
+# Weak matches only pad the prompt: keep a few files per claim, and only
+# those scoring a fair fraction of the claim's best file
+SNIPPETS_PER_CLAIM = 3
+MIN_RELATIVE_SCORE = 0.25
+
+
+def tokenize(text):
+    tokens = []
+    for word in TOKEN_REGEX.findall(text):
+        parts = CAMEL_REGEX.findall(word)
+        for token in parts if len(parts) > 1 else [word]:
+            token = token.lower()
+            if len(token) > 1 and token not in STOPWORDS:
+                tokens.append(token)
+        if len(parts) > 1:
+            whole = word.lower()
+            if whole not in STOPWORDS:
+                tokens.append(whole)
+    return tokens
+
+
+def file_terms(content):
+    # {term: count} for the most frequent terms plus the total token count
+    counts = Counter(tokenize(content))
+    return dict(counts.most_common(MAX_TERMS_PER_FILE)), sum(counts.values())
+
+
+def claim_terms(claim):
+    # The claim's own words plus the package names that signal it
+    name = normalize_claim(claim)
+    terms = set(tokenize(name))
+    for marker in TECH_SIGNATURES.get(name, ()):
+        if not marker.startswith(("ext:", "file:")):
+            terms.update(tokenize(marker))
+    return terms
+
+
+class BM25Index:
+    # Okapi BM25 over a project's files. Documents are {"path", "content"}
+    # and, when ingested by repoFiles.js, "terms"/"term_count"; older
+    # documents are tokenized here instead.
+
+    def __init__(self, docs, k1=BM25_K1, b=BM25_B):
+        self.docs = []
+        self.k1 = k1
+        self.b = b
+        document_frequency = Counter()
+        for doc in docs:
+            if not doc.get("content"):
+                continue
+            terms, length = (doc["terms"], doc.get("term_count", 0)) if doc.get("terms") else file_terms(doc["content"])
+            self.docs.append((doc, terms, length or sum(terms.values())))
+            document_frequency.update(terms.keys())
+
+        n = len(self.docs)
+        self.average_length = sum(length for _, _, length in self.docs) / max(1, n)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def search(self, query_terms, limit=None):
+        ranked = []
+        for doc, terms, length in self.docs:
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / max(1.0, self.average_length))
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                ranked.append((score, doc))
+        ranked.sort(key=lambda item: -item[0])
+        return ranked[:limit] if limit else ranked
+
+
+def best_snippet(content, query_terms, max_chars, window=SNIPPET_LINES):
+    # The window of lines with the most query-term hits, trimmed to max_chars
+    lines = content.splitlines()
+    hits = [sum(1 for token in tokenize(line) if token in query_terms) for line in lines]
+    best_start, best_hits = 0, -1
+    running = sum(hits[:window])
+    for start in range(0, max(1, len(lines) - window + 1)):
+        if start:
+            running += (hits[start + window - 1] if start + window - 1 < len(hits) else 0) - hits[start - 1]
+        if running > best_hits:
+            best_start, best_hits = start, running
+    return "\n".join(lines[best_start:best_start + window])[:max_chars]
+
+
+def select_snippets(index, claims, max_total_chars, max_file_chars):
+    # Round-robin over claims, each taking its next best-ranked file, so
+    # every claim gets evidence before any claim gets a second snippet
+    rankings = {}
+    for claim in claims:
+        ranked = index.search(claim_terms(claim), limit=SNIPPETS_PER_CLAIM)
+        rankings[claim] = [doc for score, doc in ranked if score >= MIN_RELATIVE_SCORE * ranked[0][0]]
+    used_paths = set()
+    snippets = []
+    total_chars = 0
+    rank = 0
+    while any(rank < len(ranked) for ranked in rankings.values()):
+        for claim, ranked in rankings.items():
+            if rank >= len(ranked) or ranked[rank]["path"] in used_paths:
+                continue
+            doc = ranked[rank]
+            header = f"# {doc['path']}\n"
+            budget = min(max_file_chars, max_total_chars - total_chars - len(header))
+            if budget <= 0:
+                return snippets
+            snippet = header + best_snippet(doc["content"], claim_terms(claim), budget)
+            snippets.append(snippet)
+            used_paths.add(doc["path"])
+            total_chars += len(snippet) + 1
+        rank += 1
+    return snippets
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Minimal OpenAI-compatible /v1/chat/completions stand-in for exercising the
+# scoring pipeline offline. Point the client at it with
+# OPENAI_BASE_URL=http://127.0.0.1:8766/v1 (any OPENAI_API_KEY works).
+HOST = os.getenv("FAKE_OPENAI_HOST", "127.0.0.1")
+PORT = int(os.getenv("FAKE_OPENAI_PORT", "8766"))
+
+
+def canned_reply(prompt):
+    # Recognizes the three prompts the pipeline sends
+    if "Score the transcript 0-100" in prompt:
+        return "72"
+    if "claimed_technologies" in prompt:
+        return json.dumps({"claimed_technologies": ["Python", "React", "MongoDB"], "alignment_score": 80})
+    if "missing_or_unconfirmed" in prompt:
+        return json.dumps({"verified": ["Python", "MongoDB"], "missing_or_unconfirmed": ["React"]})
+    return "OK"
+
+
+class FakeOpenAIState:
+    def __init__(self, latency=0.0, rate_limit_every=0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+            with state.lock:
+                state.requests += 1
+                count = state.requests
+            if state.rate_limit_every and count % state.rate_limit_every == 0:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                {"retry-after": "0.1"})
+                return
+
+            time.sleep(state.latency)
+            prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+            self._send_json(200, {
+                "id": f"chatcmpl-fake-{count}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": canned_reply(prompt)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOpenAIHandler
+
+
+def start_server(host=HOST, port=PORT, latency=0.0, rate_limit_every=0):
+    # Returns (server, state) with the server running on a daemon thread;
+    # port=0 picks a free port (see server.server_address)
+    state = FakeOpenAIState(latency, rate_limit_every)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    server, _ = start_server(latency=latency)
+    print(f"Fake OpenAI server on http://{HOST}:{server.server_address[1]}/v1 ({latency}s latency)", file=sys.stderr, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
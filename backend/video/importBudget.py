@@ -0,0 +1,94 @@
+import os
+import re
+import sys
+import argparse
+import subprocess
+from collections import namedtuple
+
+# Cold-start guard for the scoring scripts: imports each module in a fresh
+# interpreter under `-X importtime` and fails if it takes longer than the
+# budget or pulls in any dependency that should only load when its stage runs.
+#   python importBudget.py [--budget-ms 800] [module ...]
+DEFAULT_MODULES = ["NeuralNetwork", "validateClaimedTechnologies", "llmClient", "rubric", "pitch", "video"]
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+HEAVY_MODULES = [
+    "torch", "torchaudio", "transformers", "librosa", "tensorflow", "deepface", "pyaudio",
+    "openai", "pymongo", "google.cloud.vision", "pypdf",
+]
+# video.py exists to run pose estimation, so those two are expected there
+ALLOWED_HEAVY = {"video": {"cv2", "mediapipe"}}
+# Third-party packages a dev box may not have installed. A module whose import
+# stops at one of these is skipped; any other import error is a failure.
+OPTIONAL_DEPENDENCIES = {
+    "cv2", "mediapipe", "deepface", "torch", "torchaudio", "transformers", "librosa", "tensorflow",
+    "pyaudio", "openai", "pymongo", "bson", "google", "pypdf", "dotenv",
+}
+MISSING_PREFIX = "importBudget: missing module "
+
+LINE_REGEX = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# A successful import has ms and imported; a failed one has error, and
+# missing when it stopped at a module that isn't installed
+ImportResult = namedtuple("ImportResult", ["ms", "imported", "missing", "error"])
+
+
+def measure(module):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        "import sys\n"
+        "try:\n"
+        f"    import {module}\n"
+        "except ModuleNotFoundError as e:\n"
+        f"    print({MISSING_PREFIX!r} + str(e.name), file=sys.stderr)\n"
+        "    raise\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=here,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        missing = next((line[len(MISSING_PREFIX):] for line in lines if line.startswith(MISSING_PREFIX)), None)
+        return ImportResult(None, set(), missing, lines[-1] if lines else f"exit status {proc.returncode}")
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        match = LINE_REGEX.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return ImportResult(cumulative.get(module, 0) / 1000, set(cumulative), None, None)
+
+
+def check(module, budget_ms):
+    result = measure(module)
+    if result.error:
+        if result.missing and result.missing.split(".")[0] in OPTIONAL_DEPENDENCIES:
+            return f"{module}: skipped ({result.missing} is not installed)", True
+        return f"{module}: FAIL (import failed: {result.error})", False
+
+    allowed = ALLOWED_HEAVY.get(module, set())
+    heavy = sorted(name for name in HEAVY_MODULES if name in result.imported and name not in allowed)
+    problems = []
+    if result.ms > budget_ms:
+        problems.append(f"{result.ms:.0f}ms > {budget_ms:.0f}ms budget")
+    if heavy:
+        problems.append(f"eagerly imports {', '.join(heavy)}")
+    if problems:
+        return f"{module}: FAIL ({'; '.join(problems)})", False
+    return f"{module}: ok ({result.ms:.0f}ms)", True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    passed = True
+    for module in args.modules:
+        line, ok = check(module, args.budget_ms)
+        print(line)
+        passed = passed and ok
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,134 @@
+import os
+import sys
+import random
+import asyncio
+import threading
+import tracing
+from dotenv import load_dotenv
+from llmCache import CACHE_DISABLED, cache_key, get_cache
+
+load_dotenv()
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))
+
+
+def retryable_errors():
+    # openai is imported on first use so importing this module stays cheap
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError, asyncio.TimeoutError)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _usable(content, validate):
+    # Empty replies are never reused; `validate` raises on ones the caller
+    # couldn't parse
+    if not content:
+        return False
+    if validate is None:
+        return True
+    try:
+        validate(content)
+    except Exception:
+        return False
+    return True
+
+
+class AsyncLLM:
+    # All GPT calls in a process share one AsyncOpenAI client and one
+    # semaphore, so independent prompts go out together without exceeding
+    # LLM_MAX_CONCURRENCY. OPENAI_BASE_URL points the client at any
+    # OpenAI-compatible server, e.g. fakeOpenAIServer.py.
+
+    def __init__(self, client=None, max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                 timeout=LLM_TIMEOUT_SECONDS, backoff=LLM_BACKOFF_SECONDS):
+        if client is None:
+            from openai import AsyncOpenAI
+        self.client = client or AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=timeout,
+            max_retries=0,
+        )
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.retryable = retryable_errors()
+
+    async def _create(self, model, messages, temperature):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.semaphore:
+                    response = await asyncio.wait_for(
+                        self.client.chat.completions.create(model=model, messages=messages, temperature=temperature),
+                        self.timeout,
+                    )
+                return response.choices[0].message.content
+            except self.retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or self.backoff * (2 ** attempt) * (1 + random.random())
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s", file=sys.stderr, flush=True)
+                await asyncio.sleep(delay)
+
+    async def complete(self, model, messages, temperature=0, validate=None):
+        # Only temperature=0 completions are reused from llmCache, and only
+        # ones that pass `validate`, so a malformed reply is asked for again
+        # rather than served forever. SQLite runs in the loop's executor so
+        # disk I/O never stalls other requests.
+        if CACHE_DISABLED or temperature != 0:
+            return await self._create(model, messages, temperature)
+
+        loop = asyncio.get_running_loop()
+        key = cache_key(model, messages, temperature)
+        content = await loop.run_in_executor(None, lambda: get_cache().get(key))
+        hit = _usable(content, validate)
+        tracing.cache_event("llm", hit)
+        if hit:
+            print(f"LLM cache hit ({key[:12]})", file=sys.stderr, flush=True)
+            return content
+        content = await self._create(model, messages, temperature)
+        if _usable(content, validate):
+            await loop.run_in_executor(None, lambda: get_cache().put(key, model, content))
+        return content
+
+
+_loop = None
+_llm = None
+_lock = threading.Lock()
+
+
+def _get_loop():
+    # A single background event loop lets synchronous callers (pipeline stage
+    # threads) share the async client and its concurrency limit
+    global _loop, _llm
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+            _llm = asyncio.run_coroutine_threadsafe(_make_llm(), _loop).result()
+        return _loop
+
+
+async def _make_llm():
+    return AsyncLLM()
+
+
+def complete(model, messages, temperature=0, validate=None):
+    loop = _get_loop()
+    # The coroutine runs with the caller's context, so cache events inside it
+    # land in the caller's trace
+    with tracing.span("llm.complete", model=model):
+        return asyncio.run_coroutine_threadsafe(_llm.complete(model, messages, temperature, validate), loop).result()
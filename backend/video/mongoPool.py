@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import threading
+
+# One MongoClient (and so one connection pool) per process, created on first
+# use. Shared by frontend/server.py, NeuralNetwork.py and the validator.
+# Settings are read when the client is created, after callers' load_dotenv().
+DATABASE = "github_repos"
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client, _client_pid
+    # A client must not cross a fork (e.g. into a process-pool stage)
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                from pymongo import MongoClient
+                timeout_ms = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+                _client = MongoClient(
+                    os.getenv("MONGODB"),
+                    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+                    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+                    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+                    serverSelectionTimeoutMS=timeout_ms,
+                    connectTimeoutMS=timeout_ms,
+                )
+                _client_pid = os.getpid()
+    return _client
+
+
+def get_db(name=DATABASE):
+    return get_client()[name]
+
+
+def get_collection(name, database=DATABASE):
+    return get_client()[database][name]
+
+
+def ping():
+    started = time.perf_counter()
+    try:
+        get_client().admin.command("ping")
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def close():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    result = ping()
+    print(result)
+    sys.exit(0 if result["ok"] else 1)
@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# "pyin" is librosa's probabilistic YIN (accurate, slow); "yin" is the
+# vectorized estimator below. They agree on clean voiced speech, but pyin's
+# HMM keeps frames voiced across onsets and short silences that yin drops,
+# so the pitch std (and the fluency score) can differ; run this module on
+# real recordings to see the gap before switching backends.
+PITCH_BACKEND = os.getenv("PITCH_BACKEND", "pyin")
+PITCH_DECIMATE = int(os.getenv("PITCH_DECIMATE", "1"))
+
+# librosa.note_to_hz('C2') / ('C7'), without importing librosa at load time
+FMIN = 440.0 * 2 ** ((36 - 69) / 12)
+FMAX = 440.0 * 2 ** ((96 - 69) / 12)
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+# Frames per FFT batch; bounds memory on long recordings
+FRAME_BATCH = 1024
+# Frames with no dip below YIN's 0.1 threshold are still voiced when their
+# deepest dip is below this
+YIN_VOICING_THRESHOLD = float(os.getenv("YIN_VOICING_THRESHOLD", "0.4"))
+
+
+def _pyin_track(waveform, sr):
+    import librosa
+    pitches, voiced_flag, _ = librosa.pyin(
+        waveform,
+        fmin=FMIN,
+        fmax=FMAX,
+        sr=sr,
+        hop_length=HOP_LENGTH
+    )
+    return pitches, voiced_flag
+
+
+def _cmnd(frames, max_lag):
+    # YIN cumulative mean normalized difference for a batch of frames, with the
+    # difference function expanded as E(0) + E(tau) - 2 r(tau) so the
+    # autocorrelation r comes from one batched FFT
+    window = frames.shape[1] - max_lag
+    n_fft = 1 << int(np.ceil(np.log2(frames.shape[1] + window)))
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    head = np.fft.rfft(frames[:, :window], n_fft, axis=1)
+    acf = np.fft.irfft(np.conj(head) * spectrum, n_fft, axis=1)[:, :max_lag + 1]
+
+    energy = np.concatenate([np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    lags = np.arange(max_lag + 1)
+    shifted_energy = energy[:, lags + window] - energy[:, lags]
+    diff = np.maximum(energy[:, [window]] + shifted_energy - 2 * acf, 0)
+
+    cumulative = np.cumsum(diff[:, 1:], axis=1)
+    cmnd = np.ones_like(diff)
+    cmnd[:, 1:] = diff[:, 1:] * lags[1:] / np.maximum(cumulative, 1e-12)
+    return cmnd
+
+
+def _yin_batch(frames, sr, min_lag, max_lag, threshold, voicing_threshold):
+    cmnd = _cmnd(frames, max_lag)
+    lags = np.arange(cmnd.shape[1])
+    in_range = (lags >= min_lag) & (lags <= max_lag)
+    rows = np.arange(len(frames))
+
+    # First dip below the threshold, then walk down to the bottom of that dip.
+    # Frames with no such dip fall back to the deepest dip in range, which
+    # still counts as voiced if it is below voicing_threshold.
+    below = (cmnd < threshold) & in_range
+    dipped = below.any(axis=1)
+    first = np.argmax(below, axis=1)
+    local_min = np.zeros_like(below)
+    local_min[:, :-1] = cmnd[:, :-1] <= cmnd[:, 1:]
+    candidates = local_min & in_range & (lags >= first[:, None])
+    tau = np.where(candidates.any(axis=1), np.argmax(candidates, axis=1), first)
+    deepest = np.argmin(np.where(in_range, cmnd, np.inf), axis=1)
+    tau = np.where(dipped, tau, deepest)
+    voiced = dipped | (cmnd[rows, tau] < voicing_threshold)
+
+    # A minimum on the edge of the lag range is the search running out, not
+    # a period: its true f0 lies outside [fmin, fmax]
+    voiced &= (tau > min_lag) & (tau < max_lag)
+
+    # Parabolic interpolation around the chosen lag
+    tau = np.clip(tau, 1, cmnd.shape[1] - 2)
+    left, mid, right = cmnd[rows, tau - 1], cmnd[rows, tau], cmnd[rows, tau + 1]
+    denom = left - 2 * mid + right
+    shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0)
+    f0 = sr / (tau + np.clip(shift, -1, 1))
+    return f0, voiced
+
+
+def yin_track(waveform, sr, fmin=FMIN, fmax=FMAX, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH,
+              threshold=0.1, voicing_threshold=YIN_VOICING_THRESHOLD, decimate=1, silence_ratio=0.05):
+    # Frames are centred like librosa's, so with decimate=1 frame i lines up
+    # with frame i of pyin
+    min_lag = max(1, int(np.floor(sr / fmax)))
+    max_lag = int(np.ceil(sr / fmin))
+    if frame_length <= max_lag:
+        raise ValueError(f"frame_length must exceed {max_lag} samples for fmin={fmin:.1f} Hz")
+
+    padded = np.pad(np.asarray(waveform, dtype=np.float64), frame_length // 2)
+    if len(padded) < frame_length:
+        return np.empty(0), np.empty(0, dtype=bool)
+    frames = sliding_window_view(padded, frame_length)[::hop_length * max(1, decimate)]
+
+    f0 = np.empty(len(frames))
+    voiced = np.empty(len(frames), dtype=bool)
+    for start in range(0, len(frames), FRAME_BATCH):
+        batch = frames[start:start + FRAME_BATCH]
+        f0[start:start + len(batch)], voiced[start:start + len(batch)] = _yin_batch(
+            batch, sr, min_lag, max_lag, threshold, voicing_threshold)
+
+    # Silence and room noise can dip below the threshold too
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced &= rms >= silence_ratio * np.percentile(rms, 95)
+    voiced &= (f0 >= fmin) & (f0 <= fmax)
+    return np.where(voiced, f0, np.nan), voiced
+
+
+def extract_pitch(waveform, sr, backend=None, decimate=None):
+    backend = backend or PITCH_BACKEND
+    if backend not in ("pyin", "yin"):
+        raise ValueError(f"Unknown pitch backend: {backend}")
+    try:
+        if backend == "yin":
+            pitches, voiced_flag = yin_track(waveform, sr, decimate=decimate or PITCH_DECIMATE)
+        else:
+            pitches, voiced_flag = _pyin_track(waveform, sr)
+    except Exception:
+        return 0.0
+    voiced_pitches = pitches[voiced_flag]
+    if len(voiced_pitches) == 0:
+        return 0.0
+    return float(np.std(voiced_pitches))
+
+
+def extract_pitch_from_file(file_path):
+    # Process-pool entry point. The worker memory-maps the WAV itself rather
+    # than being sent the waveform, and lives here rather than in
+    # NeuralNetwork so workers only import this light module.
+    from audioStream import TARGET_SR, _resample, load_wav
+    waveform = load_wav(file_path)
+    if waveform is None:
+        # Layouts the memory map can't read are decoded in the worker instead
+        import torchaudio
+        decoded, sr = torchaudio.load(file_path)
+        waveform = _resample(decoded[0].numpy().astype(np.float32), sr)
+    return extract_pitch(waveform, TARGET_SR)
+
+
+def compare_backends(waveform, sr, decimate=1):
+    started = time.perf_counter()
+    pyin_f0, pyin_voiced = _pyin_track(waveform, sr)
+    pyin_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    yin_f0, yin_voiced = yin_track(waveform, sr, decimate=decimate)
+    yin_seconds = time.perf_counter() - started
+
+    # Per-frame agreement is only meaningful when both tracks share a hop
+    frames = min(len(pyin_f0), len(yin_f0))
+    both = pyin_voiced[:frames] & yin_voiced[:frames] if decimate == 1 else np.zeros(0, dtype=bool)
+    cents = 1200 * np.abs(np.log2(yin_f0[:frames][both] / pyin_f0[:frames][both])) if both.any() else np.zeros(0)
+
+    pyin_std = float(np.std(pyin_f0[pyin_voiced])) if pyin_voiced.any() else 0.0
+    yin_std = float(np.std(yin_f0[yin_voiced])) if yin_voiced.any() else 0.0
+    return {
+        "duration_seconds": round(len(waveform) / sr, 2),
+        "pyin_seconds": round(pyin_seconds, 3),
+        "yin_seconds": round(yin_seconds, 3),
+        "speedup": round(pyin_seconds / max(yin_seconds, 1e-9), 1),
+        "pyin_pitch_std": round(pyin_std, 2),
+        "yin_pitch_std": round(yin_std, 2),
+        # Relative to pyin; what switching PITCH_BACKEND does to the score input
+        "pitch_std_gap": round((yin_std - pyin_std) / pyin_std, 3) if pyin_std else None,
+        "pyin_voiced_frames": int(pyin_voiced.sum()),
+        "yin_voiced_frames": int(yin_voiced.sum()),
+        "voicing_agreement": round(float(np.mean(pyin_voiced[:frames] == yin_voiced[:frames])), 3) if decimate == 1 else None,
+        "within_50_cents": round(float(np.mean(cents < 50)), 3) if len(cents) else None,
+    }
+
+
+if __name__ == "__main__":
+    # Accuracy-vs-pyin harness: python pitch.py <audio> [<audio> ...] [--decimate N]
+    import json
+
+    args = sys.argv[1:]
+    decimate = 1
+    if "--decimate" in args:
+        i = args.index("--decimate")
+        decimate = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python pitch.py <audio> [<audio> ...] [--decimate N]", file=sys.stderr)
+        sys.exit(1)
+
+    for path in args:
+        import librosa
+        waveform, sr = librosa.load(path, sr=16000, mono=True)
+        print(json.dumps({"file": path, **compare_backends(waveform, sr, decimate)}))
@@ -0,0 +1,174 @@
+import json
+import numpy as np
+
+# MediaPipe PoseLandmark indices, so scoring doesn't need mediapipe imported
+NOSE = 0
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+NUM_LANDMARKS = 33
+X, Y, Z, VISIBILITY = range(4)
+
+DEFAULT_THRESHOLDS = {
+    "hand_visibility": 0.5,
+    "min_torso_length": 0.1,
+    "max_head_tilt": 0.05,
+    "min_movement": 0.002,
+    "max_movement": 0.015,
+}
+
+
+class PoseSeries:
+    # Pose landmarks of every analysed frame that had a pose, packed into a
+    # (frames, 33, 4) float32 array of x, y, z, visibility. `frames` holds
+    # each row's analysed-frame number and frame_count the total analysed,
+    # so frames without a pose still count towards the gesture rate.
+
+    def __init__(self, capacity=1024):
+        self._landmarks = np.empty((capacity, NUM_LANDMARKS, 4), dtype=np.float32)
+        self._frames = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+        self.frame_count = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def landmarks(self):
+        return self._landmarks[:self.size]
+
+    @property
+    def frames(self):
+        return self._frames[:self.size]
+
+    def _grow(self):
+        capacity = 2 * len(self._landmarks)
+        self._landmarks = np.resize(self._landmarks, (capacity, NUM_LANDMARKS, 4))
+        self._frames = np.resize(self._frames, capacity)
+
+    def add_frame(self, pose_landmarks=None):
+        # One call per analysed frame; pose_landmarks is MediaPipe's result
+        # (or None when no pose was found)
+        self.frame_count += 1
+        if pose_landmarks is None:
+            return
+        if self.size == len(self._landmarks):
+            self._grow()
+        row = self._landmarks[self.size]
+        for i, landmark in enumerate(pose_landmarks.landmark):
+            row[i] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+        self._frames[self.size] = self.frame_count - 1
+        self.size += 1
+
+    def save(self, path):
+        np.savez_compressed(path, landmarks=self.landmarks, frames=self.frames, frame_count=self.frame_count)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            series = cls(capacity=max(1, len(data["landmarks"])))
+            series.size = len(data["landmarks"])
+            series._landmarks[:series.size] = data["landmarks"]
+            series._frames[:series.size] = data["frames"]
+            series.frame_count = int(data["frame_count"])
+        return series
+
+
+def _thresholds(overrides):
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    thresholds.update(overrides or {})
+    return thresholds
+
+
+def frame_flags(landmarks, thresholds=None):
+    # Per-frame gesture and good-posture booleans plus the hip-centre
+    # x position movement is measured from
+    t = _thresholds(thresholds)
+    left_hand = landmarks[:, LEFT_WRIST]
+    right_hand = landmarks[:, RIGHT_WRIST]
+    shoulder_y = landmarks[:, RIGHT_SHOULDER, Y]
+    gesture = ((left_hand[:, VISIBILITY] > t["hand_visibility"]) & (left_hand[:, Y] < shoulder_y)) | \
+              ((right_hand[:, VISIBILITY] > t["hand_visibility"]) & (right_hand[:, Y] < shoulder_y))
+
+    shoulders = landmarks[:, [LEFT_SHOULDER, RIGHT_SHOULDER]].mean(axis=1)
+    hips = landmarks[:, [LEFT_HIP, RIGHT_HIP]].mean(axis=1)
+    torso_length = hips[:, Y] - shoulders[:, Y]
+    head_tilt = np.abs(landmarks[:, NOSE, X] - shoulders[:, X])
+    good_posture = (torso_length > t["min_torso_length"]) & (head_tilt < t["max_head_tilt"])
+
+    return gesture, good_posture, hips[:, X]
+
+
+def _movement_score(avg_movement, t):
+    return 20 if avg_movement < t["min_movement"] else 30 if avg_movement > t["max_movement"] else 100
+
+
+def pose_scores(series, thresholds=None):
+    t = _thresholds(thresholds)
+    gesture, good_posture, hip_x = frame_flags(series.landmarks, t)
+    deltas = np.abs(np.diff(hip_x))
+    avg_movement = float(deltas.mean()) if len(deltas) else 0.0
+    return {
+        "gesture_score": float(gesture.sum()) / max(1, series.frame_count) * 100,
+        "posture_score": float(good_posture.sum()) / max(1, len(series)) * 100,
+        "movement_score": _movement_score(avg_movement, t),
+    }
+
+
+def windowed_pose_scores(series, window, step=None, thresholds=None):
+    # Scores over consecutive windows of `window` analysed frames, `step`
+    # apart (default: non-overlapping), from cumulative sums so each window
+    # costs O(1). A movement delta belongs to the window of its later frame.
+    t = _thresholds(thresholds)
+    step = step or window
+    gesture, good_posture, hip_x = frame_flags(series.landmarks, t)
+    frames = series.frames
+
+    def prefix(values):
+        return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+
+    gesture_sum = prefix(gesture)
+    posture_sum = prefix(good_posture)
+    delta_sum = prefix(np.abs(np.diff(hip_x)))
+
+    starts = np.arange(0, max(1, series.frame_count - window + 1), step)
+    ends = np.minimum(starts + window, series.frame_count)
+    lo = np.searchsorted(frames, starts)
+    hi = np.searchsorted(frames, ends)
+    pose_frames = hi - lo
+    delta_lo = np.maximum(lo, 1) - 1
+    delta_hi = np.maximum(hi, 1) - 1
+    delta_counts = delta_hi - delta_lo
+    avg_movement = (delta_sum[delta_hi] - delta_sum[delta_lo]) / np.maximum(1, delta_counts)
+
+    return [
+        {
+            "start": int(start),
+            "end": int(end),
+            "gesture_score": float(gesture_sum[h] - gesture_sum[l]) / max(1, int(end - start)) * 100,
+            "posture_score": float(posture_sum[h] - posture_sum[l]) / max(1, int(n)) * 100,
+            "movement_score": _movement_score(float(m), t),
+        }
+        for start, end, l, h, n, m in zip(starts, ends, lo, hi, pose_frames, avg_movement)
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rescore a saved pose session without rerunning pose estimation")
+    parser.add_argument("session", help=".npz written by PoseSeries.save (video.py --save-pose)")
+    parser.add_argument("--thresholds", default="{}", help="JSON overrides for DEFAULT_THRESHOLDS")
+    parser.add_argument("--window", type=int, help="also report scores per window of this many analysed frames")
+    parser.add_argument("--step", type=int, help="window step in analysed frames")
+    args = parser.parse_args()
+
+    series = PoseSeries.load(args.session)
+    thresholds = json.loads(args.thresholds)
+    result = pose_scores(series, thresholds)
+    if args.window:
+        result["windows"] = windowed_pose_scores(series, args.window, args.step, thresholds)
+    print(json.dumps(result))
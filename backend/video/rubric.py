@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import tracing
+
+RUBRIC_CACHE_DIR = os.getenv("RUBRIC_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rubric_cache"))
+# Rubrics rarely run past a few pages; Vision's synchronous PDF call allows 5
+OCR_MAX_PDF_PAGES = 5
+
+WEIGHT_REGEX = re.compile(
+    r"(?P<weight>\d+(?:\.\d+)?)\s*(?:(?P<unit>%|pts?\b\.?|points?\b|marks?\b)|/\s*(?P<out_of>\d+(?:\.\d+)?))",
+    re.IGNORECASE,
+)
+BULLET_REGEX = re.compile(r"^[\s\-\*•●\d\.\)]+")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_pdf(path):
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def _pdf_text(path):
+    # Text-layer PDFs need no OCR at all; pypdf is optional
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return ""
+    try:
+        reader = PdfReader(path)
+        return "\n".join((page.extract_text() or "") for page in reader.pages).strip()
+    except Exception as e:
+        print(f"Local PDF text extraction failed: {e}", file=sys.stderr, flush=True)
+        return ""
+
+
+def _ocr_text(path, is_pdf):
+    from google.cloud import vision
+
+    print("Extracting rubric via OCR...", file=sys.stderr, flush=True)
+    client = vision.ImageAnnotatorClient()
+    with open(path, "rb") as f:
+        content = f.read()
+
+    if not is_pdf:
+        response = client.text_detection(image=vision.Image(content=content))
+        return response.text_annotations[0].description if response.text_annotations else ""
+
+    # Image OCR can't read PDFs; the files API renders the pages first
+    request = vision.AnnotateFileRequest(
+        input_config=vision.InputConfig(content=content, mime_type="application/pdf"),
+        features=[vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)],
+        pages=list(range(1, OCR_MAX_PDF_PAGES + 1)),
+    )
+    response = client.batch_annotate_files(requests=[request])
+    pages = response.responses[0].responses if response.responses else []
+    return "\n".join(page.full_text_annotation.text for page in pages if page.full_text_annotation).strip()
+
+
+def parse_criteria(text):
+    # A criterion is a line carrying a weight ("Innovation - 25%",
+    # "Technical Complexity (20 pts)", "Design: 5/10"); the lines after it,
+    # up to the next criterion, are its description
+    criteria = []
+    current = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        match = WEIGHT_REGEX.search(line)
+        name = BULLET_REGEX.sub("", line[:match.start()]).strip(" \t:-–—(|") if match else ""
+        if match and name:
+            current = {
+                "name": name,
+                "weight": float(match.group("weight")),
+                "unit": "%" if match.group("unit") == "%" else "points",
+                "out_of": float(match.group("out_of")) if match.group("out_of") else None,
+                "description": line[match.end():].strip(" \t:-–—)|"),
+            }
+            criteria.append(current)
+        elif current is not None:
+            current["description"] = f"{current['description']} {line}".strip()
+    return criteria
+
+
+def load_rubric(path):
+    # Every team in an event shares the rubric, so the parsed result is cached
+    # by content hash and only the first submission pays for extraction
+    digest = file_hash(path)
+    cache_path = os.path.join(RUBRIC_CACHE_DIR, f"{digest}.json")
+    if os.path.exists(cache_path):
+        tracing.cache_event("rubric", True)
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    tracing.cache_event("rubric", False)
+
+    is_pdf = _is_pdf(path)
+    text = ""
+    if is_pdf:
+        with tracing.span("rubric.pdf_text"):
+            text = _pdf_text(path)
+    source = "pdf-text"
+    if not text:
+        with tracing.span("rubric.ocr", pdf=is_pdf):
+            text = _ocr_text(path, is_pdf)
+        source = "ocr"
+
+    rubric = {
+        "hash": digest,
+        "source": source,
+        "text": text,
+        "criteria": parse_criteria(text),
+    }
+
+    if not text:
+        return rubric
+
+    os.makedirs(RUBRIC_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(rubric, f)
+    os.replace(tmp_path, cache_path)
+    return rubric
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python rubric.py <rubric file>", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(load_rubric(sys.argv[1]), indent=2))
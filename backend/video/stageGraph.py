@@ -0,0 +1,110 @@
+import sys
+import time
+import contextvars
+import multiprocessing
+import tracing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# The thread pool and the LLM client's event loop are already running when the
+# process pool starts, and forking a process with live threads can deadlock
+# on locks they held. Workers start from a fresh interpreter instead.
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_REQUIRED = object()
+
+
+class Stage:
+    # A pipeline step. `func` is called with the results of `deps`, in order.
+    # CPU-bound steps that hold the GIL can run in a process pool, in which
+    # case `func` and its inputs must be picklable and should be small (e.g. a
+    # file path rather than the data in it). A stage with a `default` degrades
+    # to it when it raises, and its dependents get the default as input;
+    # without one, the error fails the whole run.
+
+    def __init__(self, name, func, deps=(), executor="thread", default=_REQUIRED):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor for stage {name}: {executor}")
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.executor = executor
+        self.default = default
+
+    @property
+    def required(self):
+        return self.default is _REQUIRED
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run_stages(stages, max_workers=4, process_workers=1, trace_prefix=None):
+    # Starts every stage as soon as its dependencies are done, so wall-clock
+    # time follows the slowest path through the graph rather than the sum of
+    # all stages. Returns (results, timings) keyed by stage name. With a
+    # trace_prefix each stage is also recorded as a "<prefix>.<name>" span.
+    pending = {stage.name: stage for stage in stages}
+    by_name = dict(pending)
+    for stage in stages:
+        unknown = [d for d in stage.deps if d not in pending]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {', '.join(unknown)}")
+
+    results = {}
+    timings = {}
+    running = {}
+    submitted = {}
+    started = time.perf_counter()
+    threads = ThreadPoolExecutor(max_workers=max_workers)
+    processes = None
+    if any(stage.executor == "process" for stage in stages):
+        processes = ProcessPoolExecutor(max_workers=process_workers,
+                                        mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+
+    try:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(d in results for d in stage.deps):
+                    args = [results[d] for d in stage.deps]
+                    if stage.executor == "process":
+                        future = processes.submit(_timed, stage.func, *args)
+                    else:
+                        # Spans opened inside the stage keep the caller's submission and trace
+                        future = threads.submit(contextvars.copy_context().run, _timed, stage.func, *args)
+                    running[future] = name
+                    submitted[future] = time.perf_counter()
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Dependency cycle between stages: {', '.join(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], timings[name] = future.result()
+                except Exception as e:
+                    elapsed = time.perf_counter() - submitted[future]
+                    if trace_prefix:
+                        tracing.record(f"{trace_prefix}.{name}", elapsed, type(e).__name__)
+                    stage = by_name[name]
+                    if stage.required:
+                        raise
+                    print(f"Stage {name} failed ({type(e).__name__}: {e}); using {stage.default!r}",
+                          file=sys.stderr, flush=True)
+                    results[name], timings[name] = stage.default, elapsed
+                    continue
+                if trace_prefix:
+                    tracing.record(f"{trace_prefix}.{name}", timings[name])
+    finally:
+        threads.shutdown(wait=False, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+
+    timings["total"] = time.perf_counter() - started
+    if trace_prefix:
+        tracing.record(trace_prefix, timings["total"])
+    return results, timings
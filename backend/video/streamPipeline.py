@@ -0,0 +1,132 @@
+import time
+import queue
+import threading
+
+_CLOSED = object()
+
+
+class BoundedQueue:
+    # Queue between two pipeline stages. When full, "block" applies
+    # backpressure to the producer (use it for data that must not be lost),
+    # "drop_oldest" evicts the stalest item and "drop_newest" discards the
+    # incoming one (use those for samples a slow consumer can skip).
+
+    def __init__(self, name, maxsize, policy="block"):
+        if policy not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.name = name
+        self.policy = policy
+        self.put_count = 0
+        self.dropped = 0
+        self.high_water = 0
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, item):
+        self.put_count += 1
+        if self.policy == "block":
+            self._queue.put(item)
+        elif self.policy == "drop_newest":
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        else:
+            self._put_evicting(item, count=True)
+        self.high_water = max(self.high_water, self._queue.qsize())
+        return True
+
+    def _put_evicting(self, item, count):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    if count:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        # Consumers stop once they reach the close marker
+        if self.policy == "block":
+            self._queue.put(_CLOSED)
+        else:
+            self._put_evicting(_CLOSED, count=False)
+
+    def stats(self):
+        return {
+            "put": self.put_count,
+            "dropped": self.dropped,
+            "depth": self._queue.qsize(),
+            "high_water": self.high_water,
+        }
+
+
+class StageThread(threading.Thread):
+    # One pipeline stage on its own thread. With a `source` queue it calls
+    # step(item) for every item until the queue is closed; without one it is
+    # a producer and calls step() until that returns False or stop() is set.
+
+    def __init__(self, name, step, source=None):
+        super().__init__(name=name, daemon=True)
+        self.step = step
+        self.source = source
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.error = None
+        self._stop_event = threading.Event()
+        self._started_at = None
+        self._stopped_at = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def run(self):
+        self._started_at = time.perf_counter()
+        try:
+            while not (self.source is None and self._stop_event.is_set()):
+                if self.source is not None:
+                    item = self.source.get()
+                    if item is _CLOSED:
+                        break
+                    args = (item,)
+                else:
+                    args = ()
+
+                started = time.perf_counter()
+                result = self.step(*args)
+                self.busy_seconds += time.perf_counter() - started
+                if self.source is None and result is False:
+                    break
+                self.processed += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self._stopped_at = time.perf_counter()
+            self._stop_event.set()
+
+    def stats(self):
+        end = self._stopped_at or time.perf_counter()
+        elapsed = end - self._started_at if self._started_at else 0.0
+        return {
+            "processed": self.processed,
+            "per_second": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "busy_ratio": round(self.busy_seconds / elapsed, 3) if elapsed else 0.0,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+def pipeline_stats(stages, queues):
+    return {
+        "stages": {stage.name: stage.stats() for stage in stages},
+        "queues": {q.name: q.stats() for q in queues},
+    }
@@ -0,0 +1,245 @@
+import os
+import re
+import json
+
+# Claimed technology (normalized) -> package/import names or file markers that
+# prove it is used. Claims not listed here are matched against the package
+# names found in the project directly.
+TECH_SIGNATURES = {
+    "python": {"ext:.py"},
+    "javascript": {"ext:.js", "ext:.jsx", "ext:.mjs"},
+    "typescript": {"ext:.ts", "ext:.tsx", "typescript"},
+    "html": {"ext:.html"},
+    "css": {"ext:.css", "ext:.scss"},
+    "java": {"ext:.java"},
+    "kotlin": {"ext:.kt"},
+    "swift": {"ext:.swift"},
+    "go": {"ext:.go", "file:go.mod"},
+    "rust": {"ext:.rs", "file:cargo.toml"},
+    "c++": {"ext:.cpp", "ext:.cc", "ext:.hpp"},
+    "c#": {"ext:.cs"},
+    "dart": {"ext:.dart"},
+    "flutter": {"flutter"},
+    "solidity": {"ext:.sol"},
+    "node": {"file:package.json"},
+    "react": {"react", "react-dom"},
+    "react native": {"react-native", "expo"},
+    "next": {"next"},
+    "vue": {"vue", "nuxt"},
+    "angular": {"@angular/core"},
+    "svelte": {"svelte", "@sveltejs/kit"},
+    "tailwind": {"tailwindcss"},
+    "bootstrap": {"bootstrap"},
+    "express": {"express"},
+    "socket.io": {"socket.io", "socket.io-client", "flask-socketio", "flask_socketio"},
+    "flask": {"flask"},
+    "django": {"django"},
+    "fastapi": {"fastapi"},
+    "streamlit": {"streamlit"},
+    "mongodb": {"mongodb", "pymongo", "mongoose", "motor"},
+    "postgresql": {"pg", "psycopg2", "psycopg2-binary", "psycopg", "asyncpg"},
+    "mysql": {"mysql", "mysql2", "mysqlclient", "pymysql"},
+    "sqlite": {"sqlite3", "better-sqlite3"},
+    "redis": {"redis", "ioredis"},
+    "prisma": {"prisma", "@prisma/client"},
+    "firebase": {"firebase", "firebase-admin", "firebase_admin"},
+    "supabase": {"supabase", "@supabase/supabase-js"},
+    "openai": {"openai"},
+    "gpt": {"openai"},
+    "langchain": {"langchain", "langchain-openai", "@langchain/core", "langchain_openai"},
+    "anthropic": {"anthropic", "@anthropic-ai/sdk"},
+    "gemini": {"google-generativeai", "google.generativeai", "@google/generative-ai", "google-genai"},
+    "hugging face": {"transformers", "huggingface_hub", "huggingface-hub", "@huggingface/inference"},
+    "tensorflow": {"tensorflow", "@tensorflow/tfjs"},
+    "pytorch": {"torch"},
+    "keras": {"keras"},
+    "scikit-learn": {"sklearn", "scikit-learn"},
+    "numpy": {"numpy"},
+    "pandas": {"pandas"},
+    "opencv": {"cv2", "opencv-python", "opencv-python-headless"},
+    "mediapipe": {"mediapipe", "@mediapipe/tasks-vision"},
+    "deepface": {"deepface"},
+    "google cloud": {"google.cloud", "@google-cloud/storage", "google-cloud-storage"},
+    "google cloud vision": {"google.cloud.vision", "google-cloud-vision", "@google-cloud/vision"},
+    "aws": {"boto3", "aws-sdk", "@aws-sdk/client-s3"},
+    "stripe": {"stripe"},
+    "twilio": {"twilio"},
+    "graphql": {"graphql", "@apollo/client", "apollo-server"},
+    "three.js": {"three"},
+    "electron": {"electron"},
+    "docker": {"file:dockerfile", "file:docker-compose.yml", "file:docker-compose.yaml"},
+    "ethers": {"ethers"},
+    "web3": {"web3"},
+}
+
+ALIASES = {
+    "js": "javascript",
+    "ts": "typescript",
+    "node.js": "node",
+    "nodejs": "node",
+    "react.js": "react",
+    "reactjs": "react",
+    "next.js": "next",
+    "nextjs": "next",
+    "vue.js": "vue",
+    "vuejs": "vue",
+    "express.js": "express",
+    "expressjs": "express",
+    "tailwind css": "tailwind",
+    "tailwindcss": "tailwind",
+    "mongo": "mongodb",
+    "mongoose": "mongodb",
+    "postgres": "postgresql",
+    "torch": "pytorch",
+    "sklearn": "scikit-learn",
+    "cv2": "opencv",
+    "open cv": "opencv",
+    "huggingface": "hugging face",
+    "gpt-4": "gpt",
+    "gpt-3.5": "gpt",
+    "chatgpt": "gpt",
+    "openai api": "openai",
+    "google gemini": "gemini",
+    "google vision": "google cloud vision",
+    "gcp": "google cloud",
+    "threejs": "three.js",
+    "solidity smart contracts": "solidity",
+}
+
+PYTHON_IMPORTS = [
+    re.compile(r"^\s*import\s+([\w\.]+(?:\s*,\s*[\w\.]+)*)", re.MULTILINE),
+    # "from google.cloud import vision" also counts as google.cloud.vision
+    re.compile(r"^[ \t]*from[ \t]+([\w\.]+[ \t]+import[ \t]+\(?[\w \t,]+)", re.MULTILINE),
+]
+JS_IMPORTS = [
+    re.compile(r"""\bfrom\s+['"]([^'"]+)['"]"""),
+    re.compile(r"""\brequire\(\s*['"]([^'"]+)['"]\s*\)"""),
+    re.compile(r"""\bimport\s*\(?\s*['"]([^'"]+)['"]"""),
+]
+JVM_IMPORTS = [
+    re.compile(r"^\s*import\s+(?:static\s+)?([\w\.]+)", re.MULTILINE),
+]
+DART_IMPORTS = [
+    re.compile(r"""^\s*import\s+['"]package:(\w+)""", re.MULTILINE),
+]
+GO_IMPORTS = [
+    re.compile(r"""^\s*(?:import\s+)?(?:[\w\.]+\s+)?"([\w\.\-/]+)"\s*$""", re.MULTILINE),
+]
+IMPORT_PATTERNS = {
+    ".py": PYTHON_IMPORTS,
+    ".ipynb": PYTHON_IMPORTS,
+    ".js": JS_IMPORTS,
+    ".jsx": JS_IMPORTS,
+    ".mjs": JS_IMPORTS,
+    ".cjs": JS_IMPORTS,
+    ".ts": JS_IMPORTS,
+    ".tsx": JS_IMPORTS,
+    ".vue": JS_IMPORTS,
+    ".svelte": JS_IMPORTS,
+    ".java": JVM_IMPORTS,
+    ".kt": JVM_IMPORTS,
+    ".scala": JVM_IMPORTS,
+    ".dart": DART_IMPORTS,
+    ".go": GO_IMPORTS,
+}
+
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9_\.\-]*)")
+TOML_DEPENDENCY = re.compile(r"""^\s*"?([A-Za-z0-9][A-Za-z0-9_\.\-]*)"?\s*=""", re.MULTILINE)
+TOML_ARRAY_DEPENDENCY = re.compile(r"""['"]([A-Za-z0-9][A-Za-z0-9_\.\-]*)[^'"]*['"]""")
+
+
+def normalize_claim(claim):
+    name = re.sub(r"\s+", " ", claim.strip().lower())
+    return ALIASES.get(name, name)
+
+
+def _import_names(module, extension):
+    # "google.cloud.vision" -> google, google.cloud, google.cloud.vision;
+    # "@scope/pkg/sub" -> @scope/pkg; "lodash/fp" -> lodash;
+    # "github.com/gin-gonic/gin" -> the path and gin
+    module = module.strip().lower()
+    if not module or module.startswith((".", "/")):
+        return set()
+    if extension == ".go":
+        return {module, module.rsplit("/", 1)[-1]}
+    if IMPORT_PATTERNS.get(extension) in (PYTHON_IMPORTS, JVM_IMPORTS):
+        parts = module.split(".")
+        return {".".join(parts[:i]) for i in range(1, len(parts) + 1)}
+    if module.startswith("@"):
+        return {"/".join(module.split("/")[:2])}
+    return {module.split("/")[0]}
+
+
+def _split_import(match):
+    # "a, b" -> a, b; "pkg import x, y as z" -> pkg, pkg.x, pkg.y
+    parts = re.split(r"\s+import\s+", match, maxsplit=1)
+    if len(parts) == 1:
+        return match.split(",")
+    package, names = parts
+    return [package] + [f"{package}.{name.split()[0]}" for name in names.strip(" \t(").split(",") if name.split()]
+
+
+def _manifest_packages(filename, content):
+    packages = set()
+    if filename == "package.json":
+        try:
+            manifest = json.loads(content)
+        except ValueError:
+            return packages
+        for key in ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies"):
+            packages.update(name.lower() for name in (manifest.get(key) or {}))
+    elif filename.startswith("requirements") and filename.endswith(".txt"):
+        for line in content.splitlines():
+            match = REQUIREMENT_NAME.match(line)
+            if match and not line.lstrip().startswith(("#", "-")):
+                packages.add(match.group(1).lower())
+    elif filename in ("pyproject.toml", "pipfile", "cargo.toml"):
+        packages.update(name.lower() for name in TOML_DEPENDENCY.findall(content))
+        packages.update(name.lower() for name in TOML_ARRAY_DEPENDENCY.findall(content))
+    elif filename == "pubspec.yaml":
+        packages.update(name.lower() for name in re.findall(r"^\s{2}([\w\-]+):", content, re.MULTILINE))
+    return packages
+
+
+def scan_evidence(files):
+    # files: iterable of {"path", "content"} documents. Returns a dict of
+    # marker -> first path it was seen in, for package/import names plus
+    # "ext:.py"-style extension and "file:dockerfile"-style file markers.
+    evidence = {}
+
+    def add(marker, path):
+        evidence.setdefault(marker, path)
+
+    for doc in files:
+        path = doc.get("path", "")
+        content = doc.get("content") or ""
+        filename = os.path.basename(path).lower()
+        add(f"file:{filename}", path)
+        extension = os.path.splitext(filename)[1]
+        if extension:
+            add(f"ext:{extension}", path)
+
+        for package in _manifest_packages(filename, content):
+            add(package, path)
+        for pattern in IMPORT_PATTERNS.get(extension, ()):
+            for match in pattern.findall(content):
+                for module in _split_import(match):
+                    for name in _import_names(module, extension):
+                        add(name, path)
+    return evidence
+
+
+def verify_claims(claimed_technologies, evidence):
+    # Splits claims into those the static scan proves ({claim: path}) and
+    # those it can't decide, which are left for the LLM
+    verified = {}
+    ambiguous = []
+    for claim in claimed_technologies:
+        name = normalize_claim(claim)
+        markers = TECH_SIGNATURES.get(name, {name, name.replace(" ", "-")})
+        found = next((evidence[m] for m in markers if m in evidence), None)
+        if found:
+            verified[claim] = found
+        else:
+            ambiguous.append(claim)
+    return verified, ambiguous
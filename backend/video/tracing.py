@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Timing spans and Prometheus-style metrics for the judging pipeline.
+# Every span is tagged with the submission it belongs to (set by server.py,
+# or JUDGEJAM_SUBMISSION_ID in scoring subprocesses), logged as one JSON line
+# on stderr, added to the stage latency histogram, and kept in the active
+# collect() trace so it can be returned with the result. Scoring scripts
+# return their trace in their JSON output and server.py absorb()s it, which
+# is how subprocess timings reach /api/metrics.
+TRACE_LOG = os.getenv("JUDGEJAM_TRACE_LOG", "1").lower() not in ("0", "false", "no")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = "judgejam_stage_seconds"
+STAGE_ERRORS = "judgejam_stage_errors_total"
+CACHE_REQUESTS = "judgejam_cache_requests_total"
+HTTP_SECONDS = "judgejam_http_request_seconds"
+HELP = {
+    STAGE_SECONDS: "Duration of pipeline stages in seconds",
+    STAGE_ERRORS: "Pipeline stages that raised",
+    CACHE_REQUESTS: "Cache lookups by cache and result",
+    HTTP_SECONDS: "API request duration in seconds",
+}
+
+_submission = contextvars.ContextVar("judgejam_submission", default=os.getenv("JUDGEJAM_SUBMISSION_ID"))
+_trace = contextvars.ContextVar("judgejam_trace", default=None)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    # In-process registry. Histograms and counters are updated by spans and
+    # cache events; callback metrics (queue depth, job counts) are read when
+    # the registry is rendered.
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._callbacks = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register(self, name, func, help="", kind="gauge"):
+        # func() returns a number or a list of (labels dict, value)
+        self._callbacks[name] = (func, help, kind)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+            counters = dict(self._counters)
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text or HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        seen = set()
+        for (name, labels), series in sorted(histograms.items()):
+            if name not in seen:
+                header(name, "histogram", None)
+                seen.add(name)
+            labels = dict(labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{name}_bucket{_label_text({**labels, 'le': bound})} {count}")
+            lines.append(f"{name}_bucket{_label_text({**labels, 'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{name}_sum{_label_text(labels)} {series[-2]:.6f}")
+            lines.append(f"{name}_count{_label_text(labels)} {series[-1]}")
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                header(name, "counter", None)
+                seen.add(name)
+            lines.append(f"{name}{_label_text(dict(labels))} {value}")
+        for name, (func, help_text, kind) in sorted(self._callbacks.items()):
+            try:
+                values = func()
+            except Exception as e:
+                print(f"Metric {name} failed: {e}", file=sys.stderr, flush=True)
+                continue
+            header(name, kind, help_text)
+            for labels, value in (values if isinstance(values, list) else [({}, values)]):
+                lines.append(f"{name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def submission_id():
+    return _submission.get()
+
+
+@contextmanager
+def submission(submission_id):
+    token = _submission.set(str(submission_id))
+    try:
+        yield
+    finally:
+        _submission.reset(token)
+
+
+def new_trace():
+    return {"pid": os.getpid(), "spans": [], "cache": {}}
+
+
+@contextmanager
+def collect(trace=None):
+    # Spans and cache events inside the block are also added to `trace`
+    trace = trace if trace is not None else new_trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def record(name, seconds, error=None, **attrs):
+    METRICS.observe(STAGE_SECONDS, seconds, stage=name)
+    if error:
+        METRICS.inc(STAGE_ERRORS, stage=name)
+    entry = {"span": name, "seconds": round(seconds, 4), **attrs}
+    if error:
+        entry["error"] = error
+    trace = _trace.get()
+    if trace is not None:
+        trace["spans"].append(entry)
+    if TRACE_LOG:
+        print(json.dumps({"submission": submission_id(), **entry}, default=str), file=sys.stderr, flush=True)
+
+
+@contextmanager
+def span(name, **attrs):
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record(name, time.perf_counter() - started, error, **attrs)
+
+
+def cache_event(cache, hit):
+    result = "hit" if hit else "miss"
+    METRICS.inc(CACHE_REQUESTS, cache=cache, result=result)
+    trace = _trace.get()
+    if trace is not None:
+        counts = trace["cache"].setdefault(cache, {"hit": 0, "miss": 0})
+        counts[result] += 1
+
+
+def absorb(trace):
+    # Folds a trace returned by another process into this process's metrics
+    # and the active trace, without logging its spans a second time. A trace
+    # collected in this process is already in the metrics.
+    if not trace:
+        return
+    current = _trace.get()
+    remote = trace.get("pid") != os.getpid()
+    for entry in trace.get("spans", []):
+        if remote:
+            METRICS.observe(STAGE_SECONDS, entry["seconds"], stage=entry["span"])
+            if entry.get("error"):
+                METRICS.inc(STAGE_ERRORS, stage=entry["span"])
+        if current is not None:
+            current["spans"].append(entry)
+    for cache, counts in trace.get("cache", {}).items():
+        for result, count in counts.items():
+            if count and remote:
+                METRICS.inc(CACHE_REQUESTS, count, cache=cache, result=result)
+            if current is not None:
+                merged = current["cache"].setdefault(cache, {"hit": 0, "miss": 0})
+                merged[result] = merged.get(result, 0) + count
+
+
+def breakdown(trace):
+    # Per-submission summary stored on the result: seconds per span name
+    # (summed over repeats, e.g. emotion batches) and cache hit/miss counts
+    spans = {}
+    for entry in trace.get("spans", []):
+        total = spans.setdefault(entry["span"], {"seconds": 0.0, "count": 0})
+        total["seconds"] = round(total["seconds"] + entry["seconds"], 4)
+        total["count"] += 1
+    return {"spans": spans, "cache": trace.get("cache", {})}
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import urllib.request
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+MODEL_NAME = "nyrahealth/CrisperWhisper"
+HOST = os.getenv("TRANSCRIPTION_HOST", "127.0.0.1")
+PORT = int(os.getenv("TRANSCRIPTION_PORT", "8765"))
+MAX_BATCH = int(os.getenv("TRANSCRIPTION_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("TRANSCRIPTION_MAX_WAIT_MS", "50"))
+
+
+def load_model(model_name=MODEL_NAME):
+    import torch
+    from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
+
+    print(f"Loading {model_name}...", file=sys.stderr, flush=True)
+    processor = AutoProcessor.from_pretrained(model_name)
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(model_name)
+    model.eval()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model.to(device)
+    return processor, model, device
+
+
+def transcribe_batch(asr, waveforms, sample_rate):
+    import torch
+
+    processor, model, device = asr
+    inputs = processor(list(waveforms), sampling_rate=sample_rate, return_tensors="pt")
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+    with torch.no_grad():
+        predicted_ids = model.generate(inputs["input_features"])
+    return processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+
+def request_transcription(service_url, waveform, sample_rate, timeout=600):
+    body = np.ascontiguousarray(waveform, dtype="<f4").tobytes()
+    req = urllib.request.Request(
+        service_url.rstrip("/") + "/transcribe",
+        data=body,
+        headers={"Content-Type": "application/octet-stream", "X-Sample-Rate": str(sample_rate)},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class MicroBatcher:
+    # Collects concurrent requests for up to MAX_WAIT_MS (or MAX_BATCH items)
+    # and runs them through a single generate() call.
+
+    def __init__(self, asr, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.asr = asr
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "total_latency_ms": 0.0}
+        self._stats_lock = threading.Lock()
+        threading.Thread(target=self._run, name="transcription-batcher", daemon=True).start()
+
+    def submit(self, waveform, sample_rate):
+        future = Future()
+        self.requests.put((waveform, sample_rate, time.perf_counter(), future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # The feature extractor needs one sampling rate per call
+            by_rate = {}
+            for item in batch:
+                by_rate.setdefault(item[1], []).append(item)
+
+            for sample_rate, items in by_rate.items():
+                started = time.perf_counter()
+                try:
+                    texts = transcribe_batch(self.asr, [item[0] for item in items], sample_rate)
+                except Exception as e:
+                    for item in items:
+                        item[3].set_exception(e)
+                    continue
+                finished = time.perf_counter()
+
+                for (_, _, enqueued, future), text in zip(items, texts):
+                    latency_ms = (finished - enqueued) * 1000
+                    future.set_result({
+                        "text": text,
+                        "batch_size": len(items),
+                        "queue_ms": round((started - enqueued) * 1000, 2),
+                        "inference_ms": round((finished - started) * 1000, 2),
+                        "latency_ms": round(latency_ms, 2),
+                    })
+                    with self._stats_lock:
+                        self.stats["requests"] += 1
+                        self.stats["total_latency_ms"] += latency_ms
+                with self._stats_lock:
+                    self.stats["batches"] += 1
+                print(f"Transcribed batch of {len(items)} in {(finished - started):.2f}s", file=sys.stderr, flush=True)
+
+
+def make_handler(batcher, info):
+    class TranscriptionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send_json(404, {"error": "Not found"})
+                return
+            with batcher._stats_lock:
+                stats = dict(batcher.stats)
+            stats["avg_latency_ms"] = round(stats.pop("total_latency_ms") / max(1, stats["requests"]), 2)
+            self._send_json(200, {"status": "ok", **info, **stats})
+
+        def do_POST(self):
+            if self.path != "/transcribe":
+                self._send_json(404, {"error": "Not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                sample_rate = int(self.headers.get("X-Sample-Rate", 16000))
+                waveform = np.frombuffer(self.rfile.read(length), dtype="<f4")
+                result = batcher.submit(waveform, sample_rate).result()
+                self._send_json(200, result)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} - {format % args}", file=sys.stderr, flush=True)
+
+    return TranscriptionHandler
+
+
+def serve(host=HOST, port=PORT):
+    started = time.perf_counter()
+    asr = load_model()
+    load_seconds = time.perf_counter() - started
+    print(f"Model ready on {asr[2]} after {load_seconds:.1f}s", file=sys.stderr, flush=True)
+
+    info = {"model": MODEL_NAME, "device": asr[2], "load_seconds": round(load_seconds, 2)}
+    server = ThreadingHTTPServer((host, port), make_handler(MicroBatcher(asr), info))
+    print(f"Transcription service listening on http://{host}:{port}", file=sys.stderr, flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
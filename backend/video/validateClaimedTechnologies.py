@@ -1,40 +1,84 @@
-import os
 import sys
-from pymongo import MongoClient
-from openai import OpenAI
+import tracing
 from dotenv import load_dotenv
+from llmClient import complete as llm_complete
+from mongoPool import get_collection
+from techScan import scan_evidence, verify_claims
+from codeIndex import BM25Index, select_snippets
 
 # Load environment variables
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-MONGO_URI = os.getenv("MONGODB")
 
-# Initialize clients
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client["github_repos"]
-files_collection = db["files"]
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+_indexed = False
+
+
+def ensure_indexes():
+    # Matches the (owner_repo, path) upsert key used by backend/repoFiles.js
+    global _indexed
+    if not _indexed:
+        get_collection("files").create_index([("owner_repo", 1), ("path", 1)])
+        _indexed = True
+
+
+def load_project_files(project_name):
+    ensure_indexes()
+    return list(get_collection("files").find(
+        {"owner_repo": project_name},
+        projection={"_id": 0, "path": 1, "content": 1, "terms": 1, "term_count": 1},
+    ).sort("path", 1))
+
 
 def validate_technologies(claimed_technologies, project_name, max_total_chars=12000, max_file_chars=2000):
     print(f"\nValidating technologies for project: {project_name}", file=sys.stderr)
 
-    code_files = list(files_collection.find({}))
+    with tracing.span("validation.load_files") as attrs:
+        code_files = load_project_files(project_name)
+        attrs["files"] = len(code_files)
     if not code_files:
         print("No code files found in the database.", file=sys.stderr)
         return None
 
-    total_chars = 0
-    selected_code = []
+    # Imports and dependency manifests settle the common claims; only the
+    # rest are put to the LLM
+    with tracing.span("validation.static_scan"):
+        statically_verified, ambiguous = verify_claims(claimed_technologies, scan_evidence(code_files))
+    print(f"Statically verified: {statically_verified}", file=sys.stderr)
+    if not ambiguous:
+        result = {
+            "verified": list(statically_verified),
+            "missing_or_unconfirmed": [],
+            "evidence": statically_verified,
+        }
+        print("\nValidation Result:\n", result, file=sys.stderr)
+        return result
 
-    for file in code_files:
-        if 'content' in file:
-            content = file['content'][:max_file_chars]
-            if total_chars + len(content) > max_total_chars:
-                break
-            selected_code.append(content)
-            total_chars += len(content)
+    with tracing.span("validation.llm", claims=len(ambiguous)):
+        result = _validate_with_llm(ambiguous, code_files, max_total_chars, max_file_chars)
+    if result is None:
+        return None
+    result["verified"] = list(statically_verified) + list(result["verified"])
+    result["evidence"] = statically_verified
+    return result
+
+
+def _validate_with_llm(claimed_technologies, code_files, max_total_chars, max_file_chars):
+    # Spend the character budget on the files that best match each claim
+    with tracing.span("validation.bm25"):
+        selected_code = select_snippets(BM25Index(code_files), claimed_technologies, max_total_chars, max_file_chars)
+
+    if not selected_code:
+        # Nothing mentions the claims; show the model some code regardless
+        total_chars = 0
+        for file in code_files:
+            if 'content' in file:
+                content = file['content'][:max_file_chars]
+                if total_chars + len(content) > max_total_chars:
+                    break
+                selected_code.append(content)
+                total_chars += len(content)
 
     all_code = "\n".join(selected_code)
+    print(f"Prompt code context: {len(all_code)} chars from {len(selected_code)} snippets", file=sys.stderr)
 
     prompt = (
         f"The team claims to have used the following technologies:\n"
@@ -50,53 +94,57 @@ def validate_technologies(claimed_technologies, project_name, max_total_chars=12
     )
 
     try:
-        response = openai_client.chat.completions.create(
+        content = llm_complete(
             model="gpt-4",
             messages=[{"role": "user", "content": prompt}],
-            temperature=0
+            temperature=0,
+            validate=parse_validation
         )
+    except Exception as e:
+        print(f"Error during OpenAI call: {e}", file=sys.stderr)
+        return None
 
-        content = response.choices[0].message.content.strip()
+    try:
+        result = parse_validation(content)
+    except ValueError:
+        result = {"verified": [], "missing_or_unconfirmed": []}
+    print("\nValidation Result:\n", result, file=sys.stderr)
+    return result
 
-        # Try to parse as JSON-like dict
-        try:
-            result = eval(content, {"__builtins__": {}})
-            if isinstance(result, dict) and "verified" in result and "missing_or_unconfirmed" in result:
-                print("\nValidation Result:\n", result, file=sys.stderr)
-                return result
-            else:
-                raise ValueError("Response does not contain required keys.")
-
-        except Exception:
-            # Fallback to manual parsing from natural language format
-            verified = []
-            missing = []
-            current = None
-
-            lines = content.splitlines()
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                if line.lower().startswith("the team has used"):
-                    current = "verified"
-                elif line.lower().startswith("the team has not provided"):
-                    current = "missing"
-                elif line[0].isdigit() and current:
-                    tech_name = line.split(".", 1)[1].strip()
-                    tech_name = tech_name.split(" (")[0].strip()
-                    if current == "verified":
-                        verified.append(tech_name)
-                    else:
-                        missing.append(tech_name)
-
-            result = {
-                "verified": verified,
-                "missing_or_unconfirmed": missing
-            }
-            print("\nParsed fallback result:\n", result, file=sys.stderr)
+
+def parse_validation(content):
+    # The JSON-like dict the prompt asks for, or else the numbered lists the
+    # model sometimes answers with. Raises ValueError when it is neither, so
+    # llmClient doesn't cache the reply.
+    content = (content or "").strip()
+    try:
+        result = eval(content, {"__builtins__": {}})
+        if isinstance(result, dict) and "verified" in result and "missing_or_unconfirmed" in result:
             return result
+    except Exception:
+        pass
 
-    except Exception as e:
-        print(f"Error during OpenAI call: {e}", file=sys.stderr)
-        return None
\ No newline at end of file
+    verified = []
+    missing = []
+    current = None
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.lower().startswith("the team has used"):
+            current = "verified"
+        elif line.lower().startswith("the team has not provided"):
+            current = "missing"
+        elif line[0].isdigit() and current and "." in line:
+            tech_name = line.split(".", 1)[1].strip()
+            tech_name = tech_name.split(" (")[0].strip()
+            if current == "verified":
+                verified.append(tech_name)
+            else:
+                missing.append(tech_name)
+    if current is None:
+        raise ValueError("Response is neither a validation dict nor the listed format")
+    return {
+        "verified": verified,
+        "missing_or_unconfirmed": missing
+    }
@@ -1,132 +1,398 @@
 import os
 import cv2
 import mediapipe as mp
-from deepface import DeepFace
 from collections import Counter
-import wave
-import pyaudio
+import numpy as np
 import sys
+import json
+import argparse
+import queue
+import time
+from streamPipeline import BoundedQueue, StageThread, pipeline_stats
+from audioStream import WavWriter
+from poseMetrics import PoseSeries, pose_scores
+import tracing
 
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000
 CHUNK = 1024
 RECORD_SECONDS = 60 * 10
-WAVE_OUTPUT_FILENAME = "recording.wav"
+WAVE_OUTPUT_FILENAME = os.getenv("RECORDING_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "recording.wav"))
 
-print("Starting audio recording...", file=sys.stderr, flush=True)
-audio = pyaudio.PyAudio()
-stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
-frames = []
+# Offline analysis samples the video instead of looking at every frame
+ANALYSIS_FPS = float(os.getenv("VIDEO_ANALYSIS_FPS", "5"))
+EMOTION_FPS = float(os.getenv("VIDEO_EMOTION_FPS", "2"))
+EMOTION_BATCH_SIZE = int(os.getenv("VIDEO_EMOTION_BATCH_SIZE", "8"))
+
+# Emotion runs on a face crop cut out around the pose landmarks; the emotion
+# model itself only looks at 48x48 grayscale, so a small crop loses nothing
+FACE_CROP_SIZE = int(os.getenv("VIDEO_FACE_CROP_SIZE", "112"))
+EMOTION_MIN_INTERVAL = float(os.getenv("VIDEO_EMOTION_MIN_INTERVAL", "0.25"))
+EMOTION_MAX_INTERVAL = float(os.getenv("VIDEO_EMOTION_MAX_INTERVAL", "2.0"))
+# Head motion since the last emotion sample, in shoulder widths
+EMOTION_MOTION_LOW = 0.03
+EMOTION_MOTION_HIGH = 0.15
 
-cap = cv2.VideoCapture(1)
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()
 
-gesture_count = 0
-emotion_counts = Counter()
-frame_count = 0
-good_posture_frames = 0
-posture_score_count = 0
-prev_center_x = None
-movement_deltas = []
 
-print("Starting live analysis. Press 'q' to stop.", file=sys.stderr, flush=True)
+class PitchMetrics:
+    # Everything scores() needs; shared by live capture and file analysis.
+    # Pose landmarks are kept as a PoseSeries so sessions can be rescored.
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
+    def __init__(self):
+        self.emotion_counts = Counter()
+        self.pose = PoseSeries()
 
-    data = stream.read(CHUNK)
-    frames.append(data)
+    @property
+    def frame_count(self):
+        return self.pose.frame_count
 
-    frame_count += 1
-    display_frame = cv2.flip(frame.copy(), 1)
+    def add_frame(self, pose_landmarks):
+        self.pose.add_frame(pose_landmarks)
 
-    if frame_count % 15 == 0:
-        try:
-            result = DeepFace.analyze(display_frame, actions=["emotion"], enforce_detection=False)
-            dominant_emotion = result[0]['dominant_emotion']
-            emotion_counts[dominant_emotion] += 1
-        except Exception:
-            pass
+    def scores(self, thresholds=None):
+        emotion_counts = self.emotion_counts
+        positive_emotions = emotion_counts['happy'] + emotion_counts['surprise'] + emotion_counts['neutral']
+        total_emotion_frames = sum(emotion_counts.values())
+        emotion_score = (positive_emotions / max(1, total_emotion_frames)) * 100
 
-    rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-    result = pose.process(rgb_frame)
+        pose = pose_scores(self.pose, thresholds)
+        gesture_score = pose["gesture_score"]
+        posture_score = pose["posture_score"]
+        movement_score = pose["movement_score"]
 
-    if result.pose_landmarks:
-        landmarks = result.pose_landmarks.landmark
+        final_score = round(0.3 * emotion_score + 0.2 * gesture_score + 0.2 * posture_score + 0.3 * movement_score, 2)
 
-        left_hand = landmarks[mp_pose.PoseLandmark.LEFT_WRIST]
-        right_hand = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST]
-        right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
+        return {
+            "emotion_score": emotion_score,
+            "gesture_score": gesture_score,
+            "posture_score": posture_score,
+            "movement_score": movement_score,
+            "final_score": final_score,
+            "emotion_counts": dict(emotion_counts)
+        }
+
+
+def _visible(landmark):
+    return landmark.visibility > 0.5
+
+
+def face_crop(frame, pose_landmarks, size=FACE_CROP_SIZE):
+    # Square crop around the head, sized from ear (or shoulder) spacing, and
+    # downscaled to size x size. Returns None when the head isn't tracked.
+    landmarks = pose_landmarks.landmark
+    nose = landmarks[mp_pose.PoseLandmark.NOSE]
+    if not _visible(nose):
+        return None
+
+    left_ear = landmarks[mp_pose.PoseLandmark.LEFT_EAR]
+    right_ear = landmarks[mp_pose.PoseLandmark.RIGHT_EAR]
+    left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER]
+    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
+
+    height, width = frame.shape[:2]
+    if _visible(left_ear) and _visible(right_ear):
+        side = abs(left_ear.x - right_ear.x) * width * 1.8
+    elif _visible(left_shoulder) and _visible(right_shoulder):
+        side = abs(left_shoulder.x - right_shoulder.x) * width * 0.7
+    else:
+        return None
+    side = int(max(side, 32))
+
+    cx, cy = int(nose.x * width), int(nose.y * height)
+    x0, y0 = max(0, cx - side // 2), max(0, cy - side // 2)
+    x1, y1 = min(width, x0 + side), min(height, y0 + side)
+    if x1 - x0 < 16 or y1 - y0 < 16:
+        return None
+    return cv2.resize(frame[y0:y1, x0:x1], (size, size), interpolation=cv2.INTER_AREA)
+
+
+class EmotionSampler:
+    # Decides when the next emotion sample is due. The interval halves while
+    # the head is moving (expressions change) and grows while it is still,
+    # within [min_interval, max_interval] seconds.
 
-        if left_hand.visibility > 0.5 and left_hand.y < right_shoulder.y:
-            gesture_count += 1
-        elif right_hand.visibility > 0.5 and right_hand.y < right_shoulder.y:
-            gesture_count += 1
+    def __init__(self, base_interval, min_interval=EMOTION_MIN_INTERVAL, max_interval=EMOTION_MAX_INTERVAL):
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.base_interval = base_interval
+        self.interval = base_interval
+        self.last_time = None
+        self.last_head = None
 
+    def due(self, t, pose_landmarks=None):
+        if pose_landmarks is None:
+            # No landmarks to crop from or measure motion with: fixed rate
+            return self._take(t, None) if self._elapsed(t) >= self.base_interval else False
+
+        landmarks = pose_landmarks.landmark
         nose = landmarks[mp_pose.PoseLandmark.NOSE]
         left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER]
         right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-        left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP]
+        scale = max(abs(left_shoulder.x - right_shoulder.x), 0.05)
+        head = (nose.x / scale, nose.y / scale)
+
+        if self.last_head is None:
+            motion = EMOTION_MOTION_HIGH
+        else:
+            motion = abs(head[0] - self.last_head[0]) + abs(head[1] - self.last_head[1])
+
+        if motion >= EMOTION_MOTION_HIGH:
+            self.interval = max(self.min_interval, self.interval / 2)
+        if self._elapsed(t) < self.interval:
+            return False
+        if motion < EMOTION_MOTION_LOW:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return self._take(t, head)
+
+    def _elapsed(self, t):
+        return float("inf") if self.last_time is None else t - self.last_time
+
+    def _take(self, t, head):
+        self.last_time = t
+        self.last_head = head
+        return True
+
+
+_batched_emotions = True
+
+
+def analyze_emotions(frames, detector_backend="opencv"):
+    # Newer DeepFace releases take a 4-D batch in one call; older ones only
+    # take single images, so fall back (once, for the whole process) to a loop.
+    # Face crops pass detector_backend="skip" so DeepFace doesn't search for
+    # the face again.
+    global _batched_emotions
+    from deepface import DeepFace
+    if _batched_emotions and len(frames) > 1:
+        try:
+            results = DeepFace.analyze(np.stack(frames), actions=["emotion"], detector_backend=detector_backend,
+                                       enforce_detection=False, silent=True)
+            if len(results) == len(frames) and all(isinstance(r, list) for r in results):
+                return [r[0]['dominant_emotion'] if r else None for r in results]
+        except Exception:
+            pass
+        _batched_emotions = False
+
+    emotions = []
+    for frame in frames:
+        try:
+            result = DeepFace.analyze(frame, actions=["emotion"], detector_backend=detector_backend,
+                                      enforce_detection=False)
+            emotions.append(result[0]['dominant_emotion'])
+        except Exception:
+            emotions.append(None)
+    return emotions
+
+
+def _add_emotions(metrics, frames, detector_backend="opencv"):
+    for emotion in analyze_emotions(frames, detector_backend):
+        if emotion:
+            metrics.emotion_counts[emotion] += 1
+
+
+def _emotion_sample(frame, pose_landmarks):
+    # (image, detector_backend) for one emotion sample: the face crop when the
+    # head is tracked, otherwise the full frame with DeepFace's own detector
+    crop = face_crop(frame, pose_landmarks) if pose_landmarks else None
+    if crop is not None:
+        return crop, "skip"
+    return frame, "opencv"
+
+
+def analyze_video_file(path, analysis_fps=ANALYSIS_FPS, emotion_fps=EMOTION_FPS, batch_size=EMOTION_BATCH_SIZE,
+                       save_pose=None):
+    # Headless scoring of an uploaded pitch video. Only sampled frames are
+    # decoded (the rest are grabbed and skipped), pose runs on every sampled
+    # frame, and emotion runs in batches on face crops taken from the pose
+    # landmarks at an interval that adapts to head motion.
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {path}")
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    pose_step = max(1, round(source_fps / analysis_fps))
+
+    metrics = PitchMetrics()
+    sampler = EmotionSampler(1 / emotion_fps)
+    pending_emotions = {"skip": [], "opencv": []}
+    emotion_samples = 0
+    index = -1
+    # Per-frame work is summed into one decode and one pose span
+    decode_seconds = 0.0
+    pose_seconds = 0.0
+
+    with mp_pose.Pose() as pose:
+        while True:
+            index += 1
+            step_started = time.perf_counter()
+            if index % pose_step != 0:
+                grabbed = cap.grab()
+                decode_seconds += time.perf_counter() - step_started
+                if not grabbed:
+                    break
+                continue
+
+            ret, frame = cap.read()
+            decode_seconds += time.perf_counter() - step_started
+            if not ret:
+                break
+            display_frame = cv2.flip(frame, 1)
+
+            pose_started = time.perf_counter()
+            result = pose.process(cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB))
+            metrics.add_frame(result.pose_landmarks)
+            pose_seconds += time.perf_counter() - pose_started
+
+            if sampler.due(index / source_fps, result.pose_landmarks):
+                image, backend = _emotion_sample(display_frame, result.pose_landmarks)
+                pending = pending_emotions[backend]
+                pending.append(image)
+                emotion_samples += 1
+                if len(pending) >= batch_size:
+                    with tracing.span("video.emotion", samples=len(pending), backend=backend):
+                        _add_emotions(metrics, pending, backend)
+                    pending.clear()
+
+    for backend, pending in pending_emotions.items():
+        if pending:
+            with tracing.span("video.emotion", samples=len(pending), backend=backend):
+                _add_emotions(metrics, pending, backend)
+    cap.release()
+    tracing.record("video.decode", decode_seconds, frames=index)
+    tracing.record("video.pose", pose_seconds, frames=metrics.frame_count)
 
-        shoulder_avg_y = (left_shoulder.y + right_shoulder.y) / 2
-        hip_avg_y = (left_hip.y + right_hip.y) / 2
-        torso_length = hip_avg_y - shoulder_avg_y
-        head_tilt = abs(nose.x - ((left_shoulder.x + right_shoulder.x) / 2))
+    print(f"Analyzed {metrics.frame_count} of {index} frames ({emotion_samples} emotion samples) from {path}",
+          file=sys.stderr, flush=True)
+    if save_pose:
+        # Rescore later with `python poseMetrics.py <file>`
+        metrics.pose.save(save_pose)
+    return metrics.scores()
 
-        posture_score_count += 1
-        if torso_length > 0.1 and head_tilt < 0.05:
-            good_posture_frames += 1
 
-        mid_hip_x = (left_hip.x + right_hip.x) / 2
-        if prev_center_x is not None:
-            delta_x = abs(mid_hip_x - prev_center_x)
-            movement_deltas.append(delta_x)
-        prev_center_x = mid_hip_x
+def run_live(output_path=WAVE_OUTPUT_FILENAME):
+    print("Starting audio recording...", file=sys.stderr, flush=True)
+    # Only live capture needs the microphone
+    import pyaudio
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
+    # Chunks go straight to disk, so nothing accumulates in memory and an
+    # interrupted session still leaves a playable recording behind
+    recording = WavWriter(output_path, CHANNELS, audio.get_sample_size(pyaudio.paInt16), RATE)
 
-    cv2.putText(display_frame, "Press 'q' to quit", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-    cv2.imshow('Live Pitch Evaluator', display_frame)
+    cap = cv2.VideoCapture(1)
+    pose = mp_pose.Pose()
+    metrics = PitchMetrics()
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    # Capture never waits on analysis: audio chunks are queued losslessly,
+    # while the analysis and display queues drop stale frames when full
+    audio_queue = BoundedQueue("audio", 512, "block")
+    display_queue = BoundedQueue("display", 2, "drop_oldest")
+    pose_queue = BoundedQueue("pose", 8, "drop_oldest")
+    emotion_queue = BoundedQueue("emotion", 2, "drop_oldest")
+    sampler = EmotionSampler(1 / EMOTION_FPS)
+    started = time.monotonic()
 
-print("Stopping audio recording...", file=sys.stderr, flush=True)
-stream.stop_stream()
-stream.close()
-audio.terminate()
+    def capture_audio():
+        audio_queue.put(stream.read(CHUNK, exception_on_overflow=False))
 
-output_path = os.path.join(os.path.dirname(__file__), "recording.wav")
-with wave.open(output_path, 'wb') as wf:
-    wf.setnchannels(CHANNELS)
-    wf.setsampwidth(audio.get_sample_size(FORMAT))
-    wf.setframerate(RATE)
-    wf.writeframes(b''.join(frames))
-print(f"WAV audio saved locally as {output_path}.", file=sys.stderr, flush=True)
+    def capture_frame():
+        if not cap.isOpened():
+            return False
+        ret, frame = cap.read()
+        if not ret:
+            return False
+        display_frame = cv2.flip(frame, 1)
+        display_queue.put(display_frame.copy())
+        pose_queue.put((time.monotonic() - started, display_frame))
 
-cap.release()
-cv2.destroyAllWindows()
+    def estimate_pose(item):
+        t, frame = item
+        result = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        metrics.add_frame(result.pose_landmarks)
+        # The pose stage picks emotion samples so it can hand over a face crop
+        if sampler.due(t, result.pose_landmarks):
+            emotion_queue.put(_emotion_sample(frame, result.pose_landmarks))
 
-positive_emotions = emotion_counts['happy'] + emotion_counts['surprise'] + emotion_counts['neutral']
-total_emotion_frames = sum(emotion_counts.values())
-emotion_score = (positive_emotions / max(1, total_emotion_frames)) * 100
-gesture_score = (gesture_count / max(1, frame_count)) * 100
-posture_score = (good_posture_frames / max(1, posture_score_count)) * 100
+    producers = [
+        StageThread("audio_capture", capture_audio),
+        StageThread("frame_decode", capture_frame),
+    ]
+    consumers = [
+        StageThread("audio_sink", recording.write, source=audio_queue),
+        StageThread("pose", estimate_pose, source=pose_queue),
+        StageThread("emotion", lambda sample: _add_emotions(metrics, [sample[0]], sample[1]), source=emotion_queue),
+    ]
+    for stage in producers + consumers:
+        stage.start()
 
-avg_movement = sum(movement_deltas) / max(1, len(movement_deltas))
-movement_score = 20 if avg_movement < 0.002 else 30 if avg_movement > 0.015 else 100
+    print("Starting live analysis. Press 'q' to stop.", file=sys.stderr, flush=True)
+
+    # cv2 windows belong to the main thread
+    decoder = producers[1]
+    while not decoder.stopped():
+        try:
+            display_frame = display_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        cv2.putText(display_frame, "Press 'q' to quit", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        cv2.imshow('Live Pitch Evaluator', display_frame)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    print("Stopping audio recording...", file=sys.stderr, flush=True)
+    for stage in producers:
+        stage.stop()
+        stage.join()
+    for q in (audio_queue, pose_queue, emotion_queue):
+        q.close()
+    for stage in consumers:
+        stage.join()
+
+    stream.stop_stream()
+    stream.close()
+    audio.terminate()
+
+    recording.close()
+    print(f"WAV audio saved locally as {output_path}.", file=sys.stderr, flush=True)
+
+    cap.release()
+    cv2.destroyAllWindows()
+    pose.close()
+
+    stats = pipeline_stats(producers + consumers, [audio_queue, display_queue, pose_queue, emotion_queue])
+    print("Pipeline stats:", json.dumps(stats), file=sys.stderr, flush=True)
+
+    result = metrics.scores()
+    result["pipeline_stats"] = stats
+    return result
+
+
+_live_scores = None
 
-final_score = round(0.3 * emotion_score + 0.2 * gesture_score + 0.2 * posture_score + 0.3 * movement_score, 2)
 
 def scores():
-    return {
-        "emotion_score": emotion_score,
-        "gesture_score": gesture_score,
-        "posture_score": posture_score,
-        "movement_score": movement_score,
-        "final_score": final_score,
-        "emotion_counts": dict(emotion_counts)
-    }
\ No newline at end of file
+    # Live-capture scores; the capture session runs on the first call
+    global _live_scores
+    if _live_scores is None:
+        with tracing.span("video.live_session"):
+            _live_scores = run_live()
+    return _live_scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", help="pitch video to analyze offline; omit for live webcam capture")
+    parser.add_argument("--fps", type=float, default=ANALYSIS_FPS, help="pose sampling rate for --input")
+    parser.add_argument("--emotion-fps", type=float, default=EMOTION_FPS, help="emotion sampling rate for --input")
+    parser.add_argument("--save-pose", help="write the pose time-series of --input to this .npz")
+    args = parser.parse_args()
+
+    if args.input:
+        result = analyze_video_file(args.input, analysis_fps=args.fps, emotion_fps=args.emotion_fps,
+                                    save_pose=args.save_pose)
+    else:
+        result = scores()
+    print(json.dumps(result))
@@ -0,0 +1,51 @@
+import os
+import sys
+import uuid
+import shutil
+import tempfile
+
+WORK_ROOT = os.getenv("JUDGEJAM_WORK_DIR", os.path.join(tempfile.gettempdir(), "judgejam"))
+RETAIN_WORKSPACES = os.getenv("JUDGEJAM_RETAIN_WORKSPACES", "").lower() in ("1", "true", "yes")
+
+
+class Workspace:
+    # A private directory for one scoring job. Every input and intermediate
+    # file of the job lives here, so concurrent jobs never share a path.
+    # Removed on cleanup() (or when used as a context manager) unless
+    # retention is requested, e.g. to debug a submission.
+
+    def __init__(self, job_id=None, root=WORK_ROOT, retain=RETAIN_WORKSPACES):
+        self.job_id = str(job_id or uuid.uuid4().hex)
+        self.path = os.path.join(root, self.job_id)
+        self.retain = retain
+        os.makedirs(self.path, exist_ok=True)
+
+    def file(self, name):
+        return os.path.join(self.path, os.path.basename(name))
+
+    def save(self, name, source):
+        # `source` may be bytes, a readable file object, or anything with a
+        # werkzeug-style save(path) method
+        path = self.file(name)
+        if isinstance(source, (bytes, bytearray)):
+            with open(path, "wb") as f:
+                f.write(source)
+        elif hasattr(source, "save"):
+            source.save(path)
+        else:
+            with open(path, "wb") as f:
+                shutil.copyfileobj(source, f)
+        return path
+
+    def cleanup(self):
+        if self.retain:
+            print(f"Retaining workspace {self.path}", file=sys.stderr, flush=True)
+            return
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
@@ -22,6 +22,24 @@ import { Input } from "@/components/ui/input";
 import Image from "next/image";
 import PixelBorder from "./pixel-border";
 
+// Result polling: how often, and how long before giving up on a submission
+const RESULT_POLL_INTERVAL_MS = 2000;
+const RESULT_MAX_WAIT_MS = 15 * 60 * 1000;
+
+// Resolves after `ms`, or rejects as soon as `signal` aborts
+const sleep = (ms: number, signal: AbortSignal) =>
+  new Promise<void>((resolve, reject) => {
+    const timer = setTimeout(resolve, ms);
+    signal.addEventListener(
+      "abort",
+      () => {
+        clearTimeout(timer);
+        reject(new DOMException("Polling stopped", "AbortError"));
+      },
+      { once: true }
+    );
+  });
+
 export default function JudgeJamInterface() {
   const [time, setTime] = useState(300); // 5 minutes in seconds
   const [isTimerRunning, setIsTimerRunning] = useState(false);
@@ -39,6 +57,8 @@ export default function JudgeJamInterface() {
   const [eventStartDate, setEventStartDate] = useState("");
   const [selectedRubric, setSelectedRubric] = useState<File | null>(null);
   const [isSubmitting, setIsSubmitting] = useState(false);
+  const [submitError, setSubmitError] = useState<string | null>(null);
+  const pollAbortRef = useRef<AbortController | null>(null);
   const rubricInputRef = useRef<HTMLInputElement>(null);
   const videoRef = useRef<HTMLVideoElement>(null);
   const [streamActive, setStreamActive] = useState(false);
@@ -65,10 +85,11 @@ export default function JudgeJamInterface() {
     return () => clearInterval(interval);
   }, [isTimerRunning, time]);
 
-  // Cleanup camera stream when component unmounts
+  // Cleanup camera stream and stop result polling when component unmounts
   useEffect(() => {
     return () => {
       stopCamera();
+      pollAbortRef.current?.abort();
     };
   }, []);
 
@@ -226,6 +247,31 @@ export default function JudgeJamInterface() {
     );
   };
 
+  // Poll a queued submission until it is done or failed, for at most
+  // RESULT_MAX_WAIT_MS; `signal` stops it early (e.g. on unmount)
+  const waitForResult = async (resultId: string, signal: AbortSignal) => {
+    const deadline = Date.now() + RESULT_MAX_WAIT_MS;
+    while (Date.now() < deadline) {
+      const response = await fetch(
+        `http://localhost:8124/api/result/${resultId}`,
+        { signal }
+      );
+      const result = await response.json();
+
+      if (!response.ok) {
+        throw new Error(result.error || "Failed to fetch result");
+      }
+      if (result.status === "done" || result.status === "failed") {
+        return result;
+      }
+
+      await sleep(RESULT_POLL_INTERVAL_MS, signal);
+    }
+    throw new Error(
+      `Analysis is taking longer than expected. Check back later for result ${resultId}.`
+    );
+  };
+
   // Handle form submission
   const handleSubmit = async () => {
     if (!isFormComplete()) {
@@ -233,6 +279,9 @@ export default function JudgeJamInterface() {
     }
 
     setIsSubmitting(true);
+    setSubmitError(null);
+    const controller = new AbortController();
+    pollAbortRef.current = controller;
 
     try {
       const formData = new FormData();
@@ -254,7 +303,15 @@ export default function JudgeJamInterface() {
         body: formData,
       });
 
-      const result = await response.json();
+      const queued = await response.json();
+      console.log("Submission queued:", queued);
+
+      if (!response.ok) {
+        throw new Error(queued.error || "Submission failed");
+      }
+
+      // Analysis runs on a server-side worker; poll until the job settles
+      const result = await waitForResult(queued.resultId, controller.signal);
       console.log("Submission result:", result);
 
       // Check for disqualification first, regardless of response status
@@ -282,7 +339,7 @@ export default function JudgeJamInterface() {
       }
 
       // Then handle other error cases
-      if (!response.ok) {
+      if (result.status === "failed") {
         throw new Error(result.error || "Submission failed");
       }
 
@@ -294,14 +351,23 @@ export default function JudgeJamInterface() {
       setTranscript("");
       alert("Project submitted and verified successfully!");
     } catch (error) {
+      // The component unmounted; there is nothing left to update
+      if (controller.signal.aborted) {
+        return;
+      }
       console.error("Submission error:", error);
-      alert(
+      setSubmitError(
         error instanceof Error
           ? error.message
           : "Failed to submit project. Please try again."
       );
     } finally {
-      setIsSubmitting(false);
+      if (pollAbortRef.current === controller) {
+        pollAbortRef.current = null;
+      }
+      if (!controller.signal.aborted) {
+        setIsSubmitting(false);
+      }
     }
   };
 
@@ -862,6 +928,12 @@ export default function JudgeJamInterface() {
                   )}
                 </Button>
               </PixelBorder>
+              {submitError && (
+                <div className="bg-red-100 border-2 border-red-400 p-4 text-red-800 flex items-start max-w-md">
+                  <AlertCircle className="h-5 w-5 mr-2 mt-0.5 flex-shrink-0" />
+                  <p>{submitError}</p>
+                </div>
+              )}
               {!isFormComplete() && (
                 <p className="text-white text-sm">
                   {!isValidGithubUrl(githubUrl) &&
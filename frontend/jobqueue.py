@@ -0,0 +1,118 @@
+import sys
+import threading
+import traceback
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+
+# Job states, in the order a submission moves through them
+QUEUED = 'queued'
+ANALYZING = 'analyzing'
+SCORING = 'scoring'
+DONE = 'done'
+FAILED = 'failed'
+
+ACTIVE_STATES = [ANALYZING, SCORING]
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobQueue:
+    # Durable queue backed by the results collection: every submission is a
+    # document whose `status` field doubles as its queue state, so a restart
+    # picks up exactly where the previous process stopped.
+
+    def __init__(self, collection, handler, workers=2, poll_interval=5.0):
+        self.collection = collection
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def enqueue(self, doc):
+        doc['status'] = QUEUED
+        doc['queuedAt'] = _now()
+        insert_res = self.collection.insert_one(doc)
+        with self._wakeup:
+            self._wakeup.notify()
+        return insert_res.inserted_id
+
+    def set_status(self, job_id, status, **fields):
+        fields['status'] = status
+        fields[f'{status}At'] = _now()
+        self.collection.update_one({'_id': job_id}, {'$set': fields})
+
+    def set_progress(self, job_id, stage):
+        # Progress reports from the analysis only move a running job between
+        # the active states; anything else would leave it looking finished,
+        # or queued and claimable again
+        if stage not in ACTIVE_STATES:
+            print(f"Ignoring unknown progress stage {stage!r} for job {job_id}", file=sys.stderr, flush=True)
+            return
+        self.collection.update_one(
+            {'_id': job_id, 'status': {'$in': ACTIVE_STATES}},
+            {'$set': {'status': stage, f'{stage}At': _now()}}
+        )
+
+    def depth(self):
+        return self.collection.count_documents({'status': QUEUED})
+
+    def start(self):
+        # Jobs left mid-flight by a crashed or restarted server go back in line
+        requeued = self.collection.update_many(
+            {'status': {'$in': ACTIVE_STATES}},
+            {'$set': {'status': QUEUED}}
+        ).modified_count
+        if requeued:
+            print(f"Requeued {requeued} interrupted job(s)", file=sys.stderr, flush=True)
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'judgejam-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Started {self.workers} analysis worker(s)", file=sys.stderr, flush=True)
+
+    def stop(self):
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _claim(self):
+        return self.collection.find_one_and_update(
+            {'status': QUEUED},
+            {'$set': {'status': ANALYZING, 'analyzingAt': _now()}},
+            sort=[('_id', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Failed to claim job: {e}", file=sys.stderr, flush=True)
+                job = None
+
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id = job['_id']
+            try:
+                result = self.handler(job, lambda stage: self.set_progress(job_id, stage))
+                self.set_status(job_id, DONE, **(result or {}))
+            except Exception as e:
+                traceback.print_exc()
+                # The worker outlives a failed write; start() requeues the job
+                # on the next restart if it stayed active
+                try:
+                    self.set_status(job_id, FAILED, error=str(e))
+                except Exception as write_error:
+                    print(f"Failed to mark job {job_id} as failed: {write_error}", file=sys.stderr, flush=True)
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend')
+WORKER_SCRIPT = 'analysisWorker.js'
+
+
+class NodeWorkerError(Exception):
+    pass
+
+
+class NodeWorker:
+    # One long-lived `node analysisWorker.js` process speaking newline-delimited
+    # JSON-RPC over stdin/stdout. Many calls may be in flight at once; each
+    # response is routed back to its caller by request id.
+
+    def __init__(self, cwd=BACKEND_DIR, script=WORKER_SCRIPT):
+        self.proc = subprocess.Popen(
+            ['node', script],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, name='node-worker-reader', daemon=True)
+        self._reader.start()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._pending)
+
+    def call(self, method, params=None, timeout=None, on_progress=None):
+        future = Future()
+        with self._lock:
+            if not self.alive():
+                raise NodeWorkerError('Analysis worker is not running')
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            if on_progress is not None:
+                self._progress[request_id] = on_progress
+            message = json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params or {}})
+            try:
+                self.proc.stdin.write(message + '\n')
+                self.proc.stdin.flush()
+            except OSError as e:
+                del self._pending[request_id]
+                self._progress.pop(request_id, None)
+                raise NodeWorkerError(f'Failed to send request to analysis worker: {e}')
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                self._progress.pop(request_id, None)
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                print(f"Ignoring malformed worker output: {line.strip()}", file=sys.stderr, flush=True)
+                continue
+
+            # Notifications carry no id of their own; progress names its request
+            if message.get('method') == 'progress':
+                params = message.get('params') or {}
+                with self._lock:
+                    on_progress = self._progress.get(params.get('id'))
+                if on_progress is not None:
+                    try:
+                        on_progress(params.get('stage'))
+                    except Exception as e:
+                        print(f"Progress callback failed: {e}", file=sys.stderr, flush=True)
+                continue
+
+            with self._lock:
+                future = self._pending.pop(message.get('id'), None)
+            if future is None:
+                continue
+            if 'error' in message:
+                future.set_exception(NodeWorkerError(message['error'].get('message', 'Unknown worker error')))
+            else:
+                future.set_result(message.get('result'))
+
+        # stdout closed: the process exited, so nothing pending will ever be answered
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(NodeWorkerError(f'Analysis worker exited with code {self.proc.wait()}'))
+
+
+class NodeWorkerPool:
+    # Fixed-size pool of NodeWorkers, started lazily and restarted if one dies.
+    # Calls go to the least busy worker.
+
+    def __init__(self, size=1, cwd=BACKEND_DIR, script=WORKER_SCRIPT):
+        self.size = max(1, int(size))
+        self.cwd = cwd
+        self.script = script
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _pick(self):
+        with self._lock:
+            self._workers = [w for w in self._workers if w.alive()]
+            if len(self._workers) < self.size:
+                worker = NodeWorker(self.cwd, self.script)
+                self._workers.append(worker)
+                return worker
+            return min(self._workers, key=lambda w: w.in_flight())
+
+    def call(self, method, params=None, timeout=None, on_progress=None):
+        return self._pick().call(method, params, timeout, on_progress)
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
@@ -1,87 +1,287 @@
 import os
 import json
 import uuid
+import time
+import atexit
+import shutil
+import hashlib
+import threading
 import subprocess
-from flask import Flask, request, jsonify, send_from_directory
+from datetime import datetime
+from flask import Flask, Request, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from pymongo import MongoClient
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 import asyncio
 import sys
+import jobqueue
+import nodeworker
+from uploadStore import UploadStore, HashingFile, UploadConflict, UploadNotFound, UploadTooLarge
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'video'))
+from workspace import Workspace
+import mongoPool
+import tracing
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
-MONGODB = os.getenv('MONGODB')
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+upload_store = UploadStore()
+UPLOAD_GC_INTERVAL_SECONDS = float(os.getenv('JUDGEJAM_UPLOAD_GC_INTERVAL_SECONDS', '3600'))
+VIDEO_EXTENSIONS = {'.mp4', '.m4v', '.mov', '.webm', '.mkv', '.avi'}
+
+
+class StreamingRequest(Request):
+    # Multipart file parts are written straight into the upload store and
+    # hashed while they arrive, instead of being spooled and copied later.
+    # Parts that submit() didn't commit are deleted when the request ends.
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return upload_store.new_file()
+
+    def close(self):
+        streams = [f.stream for f in self.files.values()] if 'files' in self.__dict__ else []
+        super().close()
+        for stream in streams:
+            if isinstance(stream, HashingFile):
+                stream.discard()
+
 
 app = Flask(__name__)
+app.request_class = StreamingRequest
 # Configure CORS to allow requests from your frontend
 CORS(app, resources={
     r"/api/*": {
         "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "methods": ["GET", "POST", "PUT", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization", "Content-Range", "X-Upload-Offset"]
     }
 })
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Pitch videos stream to disk, so the limit only bounds disk use per request;
+# larger files can go through the chunked /api/uploads endpoints
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('JUDGEJAM_MAX_UPLOAD_MB', '1024')) * 1024 * 1024
 
+# Pooled client shared with everything else in this process; it connects on
+# first use, so a database outage shows up in /api/health rather than here
 try:
-    mongo_client = MongoClient(MONGODB)
-    db = mongo_client['github_repos']
-    results_col = db['results']
+    results_col = mongoPool.get_collection('results')
 except Exception as e:
-    print(f"Failed to connect to MongoDB: {e}")
-    mongo_client = None
-    db = None
+    print(f"Failed to configure MongoDB: {e}")
     results_col = None
+atexit.register(mongoPool.close)
+
+analysis_workers = nodeworker.NodeWorkerPool(size=int(os.getenv('NODE_WORKERS', '1')))
+atexit.register(analysis_workers.close)
 
-def run_repo_analysis(owner, repo, desc_url='', event_start_date='2024-01-01T00:00:00Z'):
-    backend_dir = os.path.join(os.path.dirname(__file__), '..', 'backend')
-    node_script = f'''
-import {{ getRepoCreationDate }} from './repo.js';
-getRepoCreationDate('{owner}', '{repo}', '{desc_url}', '{event_start_date}')
-    .then(result => {{
-        console.log(JSON.stringify(result));
-        process.exit(0);
-    }})
-    .catch(error => {{
-        console.error(error);
-        process.exit(1);
-    }});
-'''
-    temp_script = os.path.join(backend_dir, 'temp_script.mjs')
-    with open(temp_script, 'w') as f:
-        f.write(node_script)
-    
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        tracing.METRICS.observe(tracing.HTTP_SECONDS, time.perf_counter() - started,
+                                endpoint=request.endpoint or 'unknown', method=request.method,
+                                status=str(response.status_code))
+    return response
+
+def run_repo_analysis(owner, repo, desc_url='', event_start_date='2024-01-01T00:00:00Z',
+                      audio_path=None, rubric_path=None, video_path=None, on_progress=None,
+                      rubric_sha256=None, media_sha256=None, submission_id=None, workspace_path=None):
     try:
-        result = subprocess.run(['node', temp_script], 
-                              cwd=backend_dir,
-                              capture_output=True, 
-                              text=True)
-        os.remove(temp_script)
-        if result.returncode != 0:
-            raise Exception(f"Node.js script failed: {result.stderr}")
-        return json.loads(result.stdout)
+        return analysis_workers.call('getRepoCreationDate', {
+            'owner': owner,
+            'repo': repo,
+            'descURL': desc_url,
+            'eventStartDate': event_start_date,
+            'audioPath': audio_path,
+            'rubricPath': rubric_path,
+            'videoPath': video_path,
+            # Content hashes let the worker reuse an unchanged earlier analysis
+            'rubricSha256': rubric_sha256,
+            'mediaSha256': media_sha256,
+            'submissionId': submission_id,
+            # Scoring writes its intermediate files (e.g. decoded audio) here
+            'workspacePath': workspace_path
+        }, on_progress=on_progress)
     except Exception as e:
         raise Exception(f"Failed to run repo analysis: {str(e)}")
 
+def process_submission(job, report_progress):
+    # Runs on a queue worker; `job` is the results document created by submit().
+    # Its trace, started by submit(), gains the queue wait and every span of
+    # the analysis, and is summarized into the result's `timings`
+    trace = job.get('trace') or tracing.new_trace()
+    workspace = Workspace(str(job['_id']))
+    with tracing.submission(job['_id']), tracing.collect(trace):
+        if job.get('queuedAt') and job.get('analyzingAt'):
+            tracing.record('queue.wait', (datetime.fromisoformat(job['analyzingAt']) -
+                                          datetime.fromisoformat(job['queuedAt'])).total_seconds())
+        try:
+            with tracing.span('worker.analysis'):
+                result = analyze_submission(job, workspace, report_progress)
+        finally:
+            workspace.cleanup()
+            collect_uploads()
+    result['trace'] = trace
+    result['timings'] = tracing.breakdown(trace)
+    return result
+
+def has_video(media_path):
+    # ffprobe can tell an audio-only .webm or .mp4 from a video one; cover
+    # art in an audio file is an attached picture, not a video. Without
+    # ffprobe the extension decides.
+    if shutil.which('ffprobe'):
+        probe = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v',
+             '-show_entries', 'stream_disposition=attached_pic', '-of', 'json', media_path],
+            capture_output=True, text=True
+        )
+        if probe.returncode == 0:
+            streams = json.loads(probe.stdout or '{}').get('streams', [])
+            return any(not stream.get('disposition', {}).get('attached_pic') for stream in streams)
+    return os.path.splitext(media_path)[1].lower() in VIDEO_EXTENSIONS
+
+def analyze_submission(job, workspace, report_progress):
+    # The uploaded media supplies the audio track, and the frames too when it
+    # is a video; the Node worker reports when it moves on to scoring them
+    media_path = job.get('mediaPath')
+    video_path = media_path if media_path and has_video(media_path) else None
+    repo_analysis = run_repo_analysis(job['owner'], job['repo'], job['descriptionUrl'], job['eventStartDate'],
+                                      audio_path=media_path, rubric_path=job.get('rubricPath'),
+                                      video_path=video_path, on_progress=report_progress,
+                                      rubric_sha256=job.get('rubricSha256'), media_sha256=job.get('mediaSha256'),
+                                      submission_id=str(job['_id']), workspace_path=workspace.path)
+
+    # Spans from the Node worker and the scoring script it ran
+    tracing.absorb(repo_analysis.pop('trace', None))
+    scoring = (repo_analysis.get('details') or {}).get('neuralNetwork')
+    if isinstance(scoring, dict):
+        tracing.absorb(scoring.pop('trace', None))
+
+    # A disqualified repository is a finished job, not a failed one
+    if repo_analysis.get('isDisqualified'):
+        return {
+            'message': 'Repository disqualified',
+            'repoAnalysis': repo_analysis
+        }
+
+    return {
+        'message': 'Repository analysis completed',
+        'repoAnalysis': repo_analysis
+    }
+
+job_queue = None
+if results_col is not None:
+    job_queue = jobqueue.JobQueue(results_col, process_submission,
+                                  workers=int(os.getenv('JUDGEJAM_WORKERS', '2')))
+
+def job_counts():
+    counts = results_col.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}])
+    return [({'status': doc['_id'] or 'unknown'}, doc['count']) for doc in counts]
+
+if job_queue is not None:
+    tracing.METRICS.register('judgejam_queue_depth', job_queue.depth, 'Submissions waiting for a worker')
+    tracing.METRICS.register('judgejam_jobs', job_counts, 'Submissions by status')
+
+_upload_gc_lock = threading.Lock()
+_last_upload_gc = 0.0
+
+def collect_uploads():
+    # Stored uploads outlive their jobs so identical files are kept once;
+    # this drops the ones no queued or running job needs once they expire,
+    # along with abandoned partial uploads. Runs at most once per interval.
+    global _last_upload_gc
+    if results_col is None or not _upload_gc_lock.acquire(blocking=False):
+        return
+    try:
+        if _last_upload_gc and time.monotonic() - _last_upload_gc < UPLOAD_GC_INTERVAL_SECONDS:
+            return
+        _last_upload_gc = time.monotonic()
+        pending = {'status': {'$in': [jobqueue.QUEUED] + jobqueue.ACTIVE_STATES}}
+        in_use = results_col.distinct('mediaPath', pending) + results_col.distinct('rubricPath', pending)
+        removed = upload_store.collect_garbage(in_use)
+        if removed:
+            print(f"Removed {removed} expired upload file(s)", file=sys.stderr, flush=True)
+    except Exception as e:
+        print(f"Upload cleanup failed: {e}", file=sys.stderr, flush=True)
+    finally:
+        _upload_gc_lock.release()
+
+def inputs_key(*parts):
+    # Identifies a submission by what it analyzes, not by who sent it
+    return hashlib.sha256('\0'.join(str(part or '') for part in parts).encode('utf-8')).hexdigest()
+
+@app.route('/api/uploads', methods=['POST'])
+def begin_upload():
+    # Resumable upload for media too large to send in one request: create
+    # it here, PUT chunks at the returned offset, then pass the uploadId to
+    # /api/submit as mediaUploadId
+    body = request.get_json(silent=True) or {}
+    filename = body.get('filename') or request.args.get('filename', '')
+    total = body.get('size', request.args.get('size'))
+    # A byte count: digits only, which also rules out negatives, fractions and booleans
+    if total is not None and not str(total).isdecimal():
+        return jsonify({'error': 'size must be a non-negative integer'}), 400
+    collect_uploads()
+    upload_id = upload_store.begin(filename, int(total) if total is not None else None)
+    return jsonify({'uploadId': upload_id, 'offset': 0}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    try:
+        return jsonify(upload_store.status(upload_id))
+    except UploadNotFound:
+        return jsonify({'error': 'Upload not found'}), 404
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    # The chunk's offset comes from "Content-Range: bytes <start>-<end>/<total>"
+    # or X-Upload-Offset; a mismatch answers 409 with the offset to resume from,
+    # and a chunk past the size given to begin_upload answers 400
+    content_range = request.headers.get('Content-Range', '')
+    try:
+        if content_range.startswith('bytes '):
+            offset = int(content_range[6:].split('-', 1)[0])
+        else:
+            offset = int(request.headers.get('X-Upload-Offset', '0'))
+        offset = upload_store.append(upload_id, offset, request.stream)
+        status = upload_store.status(upload_id)
+    except UploadNotFound:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadConflict as e:
+        return jsonify({'error': 'Offset mismatch', 'offset': e.offset}), 409
+    except UploadTooLarge as e:
+        return jsonify({'error': 'Chunk exceeds the upload size', 'total': e.total}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid Content-Range or X-Upload-Offset header'}), 400
+    return jsonify({'uploadId': upload_id, 'offset': offset, 'total': status.get('total')})
+
 @app.route('/api/submit', methods=['POST'])
 def submit():
+    # The job id is chosen up front so every span of the request carries it;
+    # spans finished before the job is stored become the start of its trace
+    job_id = ObjectId()
+    with tracing.submission(job_id), tracing.collect() as trace, tracing.span('submit.request'):
+        return _submit(job_id, trace)
+
+def _submit(job_id, trace):
     try:
-        if mongo_client is None or db is None or results_col is None:
+        if results_col is None or job_queue is None:
             return jsonify({'error': 'Database connection not available'}), 503
 
+        # Parsing the form streams and hashes the uploaded files
+        with tracing.span('submit.receive', bytes=request.content_length):
+            request.files
+
         github_url = request.form.get('githubUrl')
         transcript = request.form.get('transcript', '')
         rubric_file = request.files.get('rubric')
         media_file = request.files.get('media')
+        media_upload_id = request.form.get('mediaUploadId')
         desc_url = request.form.get('descriptionUrl')
         event_start_date = request.form.get('eventStartDate')
 
@@ -118,25 +318,6 @@ def submit():
                 'details': 'Event start date must be in ISO format (YYYY-MM-DDTHH:mm:ssZ)'
             }), 400
 
-        # Save rubric file to backend/video directory
-        backend_video_dir = os.path.join(os.path.dirname(__file__), '..', 'backend', 'video')
-        if not os.path.exists(backend_video_dir):
-            os.makedirs(backend_video_dir)
-        
-        rubric_path = os.path.join(backend_video_dir, 'rubric.pdf')
-        rubric_file.save(rubric_path)
-
-        transcript_filename = f"{uuid.uuid4()}_transcript.txt"
-        transcript_path = os.path.join(app.config['UPLOAD_FOLDER'], transcript_filename)
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            f.write(transcript)
-
-        media_path = None
-        if media_file:
-            media_filename = secure_filename(str(uuid.uuid4()) + '_' + media_file.filename)
-            media_path = os.path.join(app.config['UPLOAD_FOLDER'], media_filename)
-            media_file.save(media_path)
-
         # Parse owner/repo from GitHub URL
         try:
             url = github_url.strip()
@@ -149,101 +330,72 @@ def submit():
         except Exception:
             return jsonify({'error': 'Invalid GitHub URL format'}), 400
 
-        # Create a temporary Node.js script to call repo.js
-        backend_dir = os.path.join(os.path.dirname(__file__), '..', 'backend')
-        node_script = f'''
-import {{ getRepoCreationDate }} from './repo.js';
-
-getRepoCreationDate('{owner}', '{repo}', '{desc_url}', '{event_start_date}')
-    .then(result => {{
-        console.log(JSON.stringify(result));
-        process.exit(0);
-    }})
-    .catch(error => {{
-        console.error(error);
-        process.exit(1);
-    }});
-'''
-        temp_script = os.path.join(backend_dir, 'temp_script.mjs')
-        
-        try:
-            # Write temporary script
-            with open(temp_script, 'w', encoding='utf-8') as f:
-                f.write(node_script)
-            
-            # Run repo analysis
-            result = subprocess.run(
-                ['node', temp_script], 
-                cwd=backend_dir,
-                capture_output=True, 
-                text=True,
-                encoding='utf-8'
-            )
-            
-            # Clean up temporary script
-            try:
-                os.remove(temp_script)
-            except Exception as e:
-                print(f"Warning: Failed to remove temporary script: {e}")
-            
-            if result.returncode != 0:
-                # Try to parse stderr for disqualification info
+        # Uploads are stored by content hash, outside the per-job workspace:
+        # they are read-only inputs, and identical files are stored once
+        with tracing.span('submit.store_uploads'):
+            if media_upload_id and not media_file:
                 try:
-                    error_data = json.loads(result.stderr)
-                    if error_data.get('isDisqualified'):
-                        return jsonify(error_data), 200
-                except:
-                    pass
-                return jsonify({
-                    'error': 'Repository analysis failed',
-                    'details': result.stderr
-                }), 500
-                
-            repo_analysis = json.loads(result.stdout)
-            
-            # If the repository is disqualified, return a 200 status with the disqualification info
-            if repo_analysis.get('isDisqualified'):
-                return jsonify({
-                    'message': 'Repository disqualified',
-                    'repoAnalysis': repo_analysis
-                }), 200
-                
-        except Exception as e:
-            return jsonify({
-                'error': 'Failed to analyze repository',
-                'details': str(e)
-            }), 500
+                    media_path, media_sha256, media_reused = upload_store.finish(media_upload_id)
+                except UploadNotFound:
+                    return jsonify({'error': 'Media upload not found'}), 404
+                except UploadConflict as e:
+                    return jsonify({'error': 'Media upload incomplete', 'offset': e.offset}), 409
+            elif media_file:
+                media_path, media_sha256, media_reused = upload_store.save(media_file)
+            else:
+                media_path, media_sha256, media_reused = None, None, False
 
-        # Start video analysis if media file exists
+            if not os.path.splitext(secure_filename(rubric_file.filename or ''))[1]:
+                rubric_file.filename = 'rubric.pdf'
+            rubric_path, rubric_sha256, rubric_reused = upload_store.save(rubric_file)
         if media_path:
-            with open('video_py_out.log', 'a') as out, open('video_py_err.log', 'a') as err:
-                subprocess.Popen([
-                    'python3', os.path.join('backend', 'video', 'video.py'),
-                    '--input', media_path
-                ], stdout=out, stderr=err, close_fds=True)
+            tracing.cache_event('upload', media_reused)
+        tracing.cache_event('upload', rubric_reused)
 
-        # Store result in MongoDB
+        # The same repository, rubric and media already waiting or in
+        # progress: hand back that job rather than analyze it twice
+        key = inputs_key(owner.lower(), repo.lower(), desc_url, event_start_date,
+                         rubric_sha256, media_sha256, transcript)
+        pending = results_col.find_one(
+            {'inputsKey': key, 'status': {'$in': [jobqueue.QUEUED] + jobqueue.ACTIVE_STATES}},
+            {'status': 1}
+        )
+        tracing.cache_event('submission', pending is not None)
+        if pending:
+            return jsonify({
+                'message': 'Identical submission already in progress',
+                'resultId': str(pending['_id']),
+                'status': pending['status'],
+                'deduplicated': True
+            }), 202
+
+        # Store the submission; a queue worker picks it up and fills in repoAnalysis
         doc = {
+            '_id': job_id,
             'owner': owner,
             'repo': repo,
             'githubUrl': github_url,
             'descriptionUrl': desc_url,
             'eventStartDate': event_start_date,
             'rubricPath': rubric_path,
-            'transcriptPath': transcript_path,
+            'rubricSha256': rubric_sha256,
+            # Kept inline: the job's workspace is removed when it finishes
+            'transcript': transcript,
             'mediaPath': media_path,
-            'repoAnalysis': repo_analysis,
+            'mediaSha256': media_sha256,
+            'mediaReused': media_reused,
+            'inputsKey': key,
+            'trace': trace,
             'createdAt': str(uuid.uuid4())
         }
-        
-        insert_res = results_col.insert_one(doc)
-        result_id = str(insert_res.inserted_id)
-        
+
+        result_id = str(job_queue.enqueue(doc))
+
         return jsonify({
-            'message': 'Submission received',
+            'message': 'Submission queued',
             'resultId': result_id,
-            'repoAnalysis': repo_analysis
-        })
+            'status': jobqueue.QUEUED
+        }), 202
 
     except Exception as e:
         print(f"Error in submit endpoint: {e}")
@@ -263,6 +415,29 @@ def get_result(id):
     except Exception as e:
         return jsonify({'error': 'Failed to fetch result', 'details': str(e)}), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text format: stage and request latency histograms (scoring
+    # subprocess spans arrive with each finished job), cache hit/miss
+    # counters, queue depth and jobs by status
+    return Response(tracing.METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    checks = {'mongo': mongoPool.ping()}
+    try:
+        checks['analysisWorker'] = analysis_workers.call('health', timeout=10)
+    except Exception as e:
+        checks['analysisWorker'] = {'ok': False, 'error': str(e)}
+    if checks['mongo']['ok'] and job_queue is not None:
+        checks['queue'] = {'ok': True, 'depth': job_queue.depth()}
+    ok = all(check['ok'] for check in checks.values())
+    return jsonify({'ok': ok, 'checks': checks}), 200 if ok else 503
+
 if __name__ == '__main__':
+    # The debug reloader runs this block in two processes; only the child serves requests
+    debug = True
+    if job_queue is not None and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        job_queue.start()
     # Use threaded=False to avoid socket issues
-    app.run(host='0.0.0.0', port=8124, debug=True, threaded=False) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8124, debug=debug, threaded=False) 
\ No newline at end of file
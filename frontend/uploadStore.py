@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+from werkzeug.utils import secure_filename
+
+# Content-addressed store for uploaded rubrics and pitch media. Files are
+# written once, named by their SHA-256, and shared by every job that uploads
+# the same bytes; they outlive per-job workspaces for that reason, and are
+# removed by collect_garbage() once unused for MEDIA_RETENTION_HOURS.
+MEDIA_ROOT = os.getenv('JUDGEJAM_MEDIA_DIR', os.path.join(tempfile.gettempdir(), 'judgejam-media'))
+MEDIA_RETENTION_HOURS = float(os.getenv('JUDGEJAM_MEDIA_RETENTION_HOURS', '72'))
+# Resumable uploads with no chunk for this long are abandoned
+PARTIAL_RETENTION_HOURS = float(os.getenv('JUDGEJAM_PARTIAL_RETENTION_HOURS', '24'))
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadConflict(Exception):
+    # A chunk arrived for the wrong offset; `offset` is where to resume
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+
+class UploadTooLarge(Exception):
+    # A chunk would take the upload past the size given to begin()
+    def __init__(self, total):
+        super().__init__(f'Upload is limited to {total} bytes')
+        self.total = total
+
+
+class HashingFile:
+    # Temporary file in the store that hashes bytes as they are written, so
+    # an upload is read exactly once. Werkzeug writes multipart file parts
+    # straight into it (see StreamingRequest in server.py).
+
+    def __init__(self, directory):
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self.path = self._file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def discard(self):
+        self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadStore:
+
+    def __init__(self, root=MEDIA_ROOT):
+        self.root = root
+        self.partial_dir = os.path.join(root, 'partial')
+        os.makedirs(self.partial_dir, exist_ok=True)
+        # Running hashes of resumable uploads; rebuilt from disk after a restart
+        self._hashers = {}
+        # Guards partial uploads, and commits against garbage collection
+        self._lock = threading.RLock()
+
+    def _final_path(self, digest, filename):
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        return os.path.join(self.root, digest + extension)
+
+    def _commit(self, temp_path, digest, filename):
+        # Returns (path, digest, deduplicated)
+        path = self._final_path(digest, filename)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(temp_path)
+                # Reuse restarts the retention clock
+                os.utime(path)
+                return path, digest, True
+            os.replace(temp_path, path)
+        return path, digest, False
+
+    def new_file(self):
+        return HashingFile(self.partial_dir)
+
+    def commit(self, hashing_file, filename):
+        hashing_file._file.close()
+        hashing_file.committed = True
+        return self._commit(hashing_file.path, hashing_file.sha256.hexdigest(), filename)
+
+    def save(self, file_storage):
+        # Werkzeug FileStorage from request.files. Parts written by
+        # StreamingRequest are already on disk and hashed; anything else is
+        # copied through a HashingFile in chunks.
+        stream = file_storage.stream
+        if isinstance(stream, HashingFile):
+            return self.commit(stream, file_storage.filename)
+        target = self.new_file()
+        try:
+            for block in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                target.write(block)
+            return self.commit(target, file_storage.filename)
+        finally:
+            target.discard()
+
+    # Resumable uploads: begin() once, append() chunks at the reported
+    # offset (retrying from status() after a failure), then finish().
+
+    def _partial(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadNotFound(upload_id)
+        data_path = os.path.join(self.partial_dir, upload_id)
+        meta_path = data_path + '.json'
+        if not os.path.exists(meta_path):
+            raise UploadNotFound(upload_id)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return data_path, json.load(f)
+
+    def begin(self, filename, total=None):
+        upload_id = uuid.uuid4().hex
+        data_path = os.path.join(self.partial_dir, upload_id)
+        open(data_path, 'wb').close()
+        with open(data_path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'total': total}, f)
+        return upload_id
+
+    def status(self, upload_id):
+        data_path, meta = self._partial(upload_id)
+        return {'uploadId': upload_id, 'offset': os.path.getsize(data_path), **meta}
+
+    def _hasher(self, upload_id, data_path, offset):
+        hasher = self._hashers.get(upload_id)
+        if hasher is None or hasher[0] != offset:
+            sha256 = hashlib.sha256()
+            with open(data_path, 'rb') as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    sha256.update(block)
+            hasher = (offset, sha256)
+        return hasher[1]
+
+    def append(self, upload_id, offset, stream):
+        # Looked up under the lock, so a concurrent finish() can't commit the
+        # data file while this chunk is written to it
+        with self._lock:
+            data_path, meta = self._partial(upload_id)
+            current = os.path.getsize(data_path)
+            if offset != current:
+                raise UploadConflict(current)
+            total = meta.get('total')
+            sha256 = self._hasher(upload_id, data_path, current)
+            with open(data_path, 'ab') as f:
+                for block in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    if total is not None and current + len(block) > total:
+                        # Drop the whole chunk; the upload resumes from `offset`
+                        f.truncate(offset)
+                        self._hashers.pop(upload_id, None)
+                        raise UploadTooLarge(total)
+                    sha256.update(block)
+                    f.write(block)
+                    current += len(block)
+            self._hashers[upload_id] = (current, sha256)
+        return current
+
+    def finish(self, upload_id):
+        with self._lock:
+            data_path, meta = self._partial(upload_id)
+            size = os.path.getsize(data_path)
+            if meta.get('total') is not None and size != meta['total']:
+                raise UploadConflict(size)
+            digest = self._hasher(upload_id, data_path, size).hexdigest()
+            self._hashers.pop(upload_id, None)
+            os.remove(data_path + '.json')
+            return self._commit(data_path, digest, meta.get('filename'))
+
+    def collect_garbage(self, in_use=(), max_age_hours=MEDIA_RETENTION_HOURS,
+                        partial_max_age_hours=PARTIAL_RETENTION_HOURS):
+        # Removes stored files untouched for max_age_hours unless a pending
+        # job still needs them (`in_use` paths), and partial uploads and
+        # interrupted request spools idle for partial_max_age_hours.
+        # Returns the number of files removed.
+        now = time.time()
+        keep = {os.path.abspath(path) for path in in_use if path}
+        removed = 0
+
+        def expired(path, hours):
+            try:
+                return now - os.path.getmtime(path) > hours * 3600
+            except OSError:
+                return False
+
+        def remove(path):
+            nonlocal removed
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                print(f"Could not remove {path}: {e}", file=sys.stderr, flush=True)
+
+        with self._lock:
+            for entry in os.scandir(self.root):
+                if entry.is_file() and os.path.abspath(entry.path) not in keep and expired(entry.path, max_age_hours):
+                    remove(entry.path)
+
+            # Resumable uploads (every chunk touches the data file) and the
+            # spools of requests that died mid-upload
+            for entry in os.scandir(self.partial_dir):
+                if not entry.is_file() or entry.name.endswith('.json') or not expired(entry.path, partial_max_age_hours):
+                    continue
+                self._hashers.pop(entry.name, None)
+                remove(entry.path)
+                if os.path.exists(entry.path + '.json'):
+                    remove(entry.path + '.json')
+        return removed